@@ -1,17 +1,36 @@
 import streamlit as st
 import sys
 import os
+import asyncio
+import copy
+import html
+import io
+import logging
+import re
+import threading
+import time
+import traceback
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
+from typing import Optional
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database.qdrant_client import UniversityVectorDB
 from src.crew.coordinator import UniversityRecommendationCrew
+from src.agents.counselor import CounselorAgent
+from src.utils.groq_llm import create_groq_llm
 from src.utils.ranking import UniversityRanker
+from src.utils.hashing import stable_dumps, stable_hash
 
 
 # --------------------------- #
@@ -62,6 +81,42 @@ border-radius: 8px;
 .metric-card h3, .metric-card p {
     color: #1f2937 !important;
 }
+/* Card tables and collapsible details */
+.metric-card table {
+    width: 100%;
+    border-collapse: collapse;
+    margin: 10px 0;
+}
+.metric-card th, .metric-card td, .metric-card li, .metric-card summary {
+    color: #1f2937 !important;
+    border: none;
+    text-align: left;
+    vertical-align: top;
+}
+.metric-card summary {
+    cursor: pointer;
+    font-weight: bold;
+}
+.card-metrics {
+    display: flex;
+    gap: 10px;
+    margin: 10px 0;
+}
+.card-metrics div {
+    flex: 1;
+    background-color: #ffffff;
+    border-radius: 8px;
+    padding: 10px;
+}
+.card-metrics span {
+    display: block;
+    font-size: 0.85em;
+    color: #6b7280 !important;
+}
+.card-metrics strong {
+    font-size: 1.4em;
+    color: #1f2937 !important;
+}
 /* Fix any light text on light backgrounds */
 div[data-testid="metric-container"] {
     background-color: transparent;
@@ -70,13 +125,46 @@ div[data-testid="metric-container"] {
 """, unsafe_allow_html=True)
 
 
+# --------------------------- #
+# Form Options
+# --------------------------- #
+ORIGIN_COUNTRIES = ("India", "China", "USA", "UK", "Canada", "Nigeria", "Pakistan",
+                    "Bangladesh", "Vietnam", "Other")
+PROGRAMS = ("Computer Science", "Data Science", "Business Analytics",
+            "Mechanical Engineering", "Electrical Engineering",
+            "Economics", "Psychology", "Renewable Energy",
+            "Biomedical Engineering", "Other")
+LEVELS = ("bachelors", "masters", "phd")
+TARGET_COUNTRIES = ("USA", "UK", "Canada", "Germany", "Australia",
+                    "Netherlands", "Sweden", "France", "Switzerland")
+DEFAULT_TARGET_COUNTRIES = ("USA", "UK")
+
+# Searches kept per session, and the max length of free-text fields stored with them
+SEARCH_HISTORY_LIMIT = 20
+HISTORY_FIELD_MAX_CHARS = 200
+
+# Matches the program count line in the counselor's plan
+TARGET_PROGRAMS_RE = re.compile(r'Target \d+ programs')
+
+CATEGORY_EMOJI = MappingProxyType({'Reach': '🚀', 'Target': '🎯', 'Safety': '🛡️'})
+CATEGORY_COLORS = MappingProxyType({'Reach': '#FF6B6B', 'Target': '#4ECDC4', 'Safety': '#95E1D3'})
+
+
 # --------------------------- #
 # Session State
 # --------------------------- #
 if 'recommendations' not in st.session_state:
     st.session_state.recommendations = None
+if 'recommendation_views' not in st.session_state:
+    st.session_state.recommendation_views = None
+if 'recommendations_key' not in st.session_state:
+    st.session_state.recommendations_key = None
 if 'search_history' not in st.session_state:
-    st.session_state.search_history = []
+    st.session_state.search_history = deque(maxlen=SEARCH_HISTORY_LIMIT)
+if 'search_history_hashes' not in st.session_state:
+    st.session_state.search_history_hashes = set()
+    # Hashes in history order, so evictions don't need the entry re-hashed
+    st.session_state.search_history_keys = deque(maxlen=SEARCH_HISTORY_LIMIT)
 
 
 # --------------------------- #
@@ -94,6 +182,226 @@ def load_crew(_db):
     return UniversityRecommendationCrew(_db)
 
 
+@st.cache_resource
+def load_ranker():
+    """Load and cache the university ranker"""
+    return UniversityRanker()
+
+
+# Long-lived clients are rebuilt once a day to bound memory and pick up rotated keys
+RESOURCE_TTL_SECONDS = 24 * 60 * 60
+
+
+@st.cache_resource(ttl=RESOURCE_TTL_SECONDS)
+def load_llm():
+    """Load and cache the Groq LLM client"""
+    return create_groq_llm()
+
+
+@st.cache_resource(ttl=RESOURCE_TTL_SECONDS)
+def load_counselor():
+    """Load and cache the counselor agent used when the pipeline returns no plan"""
+    return CounselorAgent(load_llm())
+
+
+@st.cache_resource
+def load_executor():
+    """Shared worker pool for Qdrant searches that overlap the pipeline"""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="search")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def get_points_count(collection_name: str) -> int:
+    """Return the number of indexed programs, cached to avoid a Qdrant call per rerun"""
+    return load_database().client.get_collection(collection_name).points_count
+
+
+async def _search_and_prep(db, query: str, filters: dict, ranker, profile: dict, limit: int = 20) -> list:
+    """Run the filtered and unfiltered fallback searches as one gRPC batch while the ranker prepares the profile"""
+    (filtered, unfiltered), _ = await asyncio.gather(
+        db.asearch_universities_batch([(query, filters), (query, None)], limit=limit),
+        ranker.aprepare_profile(profile)
+    )
+    return filtered or unfiltered
+
+
+def compact_profile(profile: dict) -> dict:
+    """Trim free-text profile fields before storing the profile in search history"""
+    compact = dict(profile)
+    for field in ('work_experience', 'career_goals'):
+        if isinstance(compact.get(field), str):
+            compact[field] = compact[field][:HISTORY_FIELD_MAX_CHARS]
+    if isinstance(compact.get('interests'), list):
+        interests = ', '.join(compact['interests'])[:HISTORY_FIELD_MAX_CHARS]
+        compact['interests'] = [i.strip() for i in interests.split(',') if i.strip()]
+    return compact
+
+
+def _history_hash(entry: dict) -> str:
+    """Hash of a history entry, ignoring the per-submission timestamp"""
+    return stable_hash({k: v for k, v in entry.items() if k != 'timestamp'})
+
+
+def record_search(profile: dict):
+    """Append a search to history unless an identical profile is already stored"""
+    hashes = st.session_state.search_history_hashes
+    keys = st.session_state.search_history_keys
+    entry = compact_profile(profile)
+    entry_hash = _history_hash(entry)
+    if entry_hash in hashes:
+        return
+    # The deques drop their oldest entry when full; keep the hash set in step
+    if len(keys) == keys.maxlen:
+        hashes.discard(keys[0])
+    st.session_state.search_history.append(entry)
+    keys.append(entry_hash)
+    hashes.add(entry_hash)
+
+
+@st.cache_data(show_spinner=False)
+def build_query_and_filters(program: str, interests: tuple, level: str,
+                            target_countries: tuple, budget) -> tuple:
+    """Build the fallback search query and the full filter set from profile fields"""
+    query = f"{program} {' '.join(interests[:3])}".strip()
+    filters = {
+        "countries": list(target_countries),
+        "max_tuition": budget,
+        "level": level
+    }
+    return query, filters
+
+
+def profile_query_and_filters(profile: dict) -> tuple:
+    """Call build_query_and_filters with the profile's list fields made hashable"""
+    interests = profile.get('interests', [])
+    if not isinstance(interests, list):
+        interests = [str(interests)]
+    return build_query_and_filters(
+        profile.get('program', ''),
+        tuple(interests),
+        profile.get('level', ''),
+        tuple(profile.get('target_countries', [])),
+        profile.get('budget')
+    )
+
+
+def fallback_search_args(profile: dict) -> tuple:
+    """Query and level-only filters used when the pipeline finds no matches"""
+    query, filters = profile_query_and_filters(profile)
+    # Try search with only level filter (most important)
+    level = filters['level']
+    return query, ({'level': level} if level else None)
+
+
+# Pipeline and fallback search results are reused for an hour, across sessions
+RESULT_CACHE_TTL_SECONDS = 60 * 60
+RESULT_CACHE_SIZE = 256
+
+
+class ResultCache:
+    """
+    Thread-safe LRU of results with a TTL, shared by every session.
+
+    Values are deep-copied in and out, since ranking and rendering annotate
+    the match dicts in place.
+    """
+
+    def __init__(self, ttl: float = RESULT_CACHE_TTL_SECONDS, maxsize: int = RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (value, expires_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[object]:
+        """Return a copy of the value stored under key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            value = entry[0]
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value):
+        """Store a copy of value under key"""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def load_result_cache(name: str) -> ResultCache:
+    """Process-wide result cache, one per name"""
+    return ResultCache()
+
+
+def make_profile_key(profile: dict) -> str:
+    """Canonical JSON of a profile, ignoring the per-submission timestamp"""
+    return stable_dumps({k: v for k, v in profile.items() if k != 'timestamp'}).decode('utf-8')
+
+
+def cached_pipeline(profile_key: str) -> Optional[dict]:
+    """Pipeline result stored for a profile key, or None on a miss"""
+    return load_result_cache('pipeline').get(profile_key)
+
+
+def store_pipeline(profile_key: str, result: Optional[dict]):
+    """Cache a pipeline result under its profile key, unless it failed or found nothing"""
+    if result and result.get('recommendations', {}).get('matches'):
+        load_result_cache('pipeline').put(profile_key, result)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_plan(profile_key: str, portfolio_key: tuple, _portfolio: list, _profile: dict) -> str:
+    """Counselor plan cached per (profile, set of recommended programs)"""
+    return load_counselor().create_plan(_portfolio, _profile)
+
+
+def stream_pipeline(crew, profile: dict) -> dict:
+    """Run the pipeline, reporting each stage in a status box as soon as it completes"""
+    result = None
+    with st.status("AI agents are working on your profile...", expanded=True) as status:
+        for chunk in crew.iter_recommendation_process(profile):
+            stage, data = chunk['stage'], chunk['data']
+            if stage == 'research':
+                countries = ', '.join(data.get('countries', [])) or 'your target countries'
+                st.write(f"🔎 Gathered requirements for {countries}")
+            elif stage == 'matches':
+                st.write(f"🎯 Found {len(data)} candidate programs")
+                if data:
+                    st.caption(' · '.join(uni.get('univ_name', 'Unknown') for uni in data[:5]))
+            elif stage == 'plan':
+                st.write("📋 Drafted your application plan")
+            elif stage == 'issues':
+                st.write(f"📅 Checked deadlines ({len(data)} potential issues)")
+            elif stage == 'verification':
+                st.write(f"🔍 Double-checked {len(data.get('llm_reviewed', []))} doubtful programs")
+            elif stage == 'done':
+                result = data
+        status.update(label="AI agents finished", state="complete", expanded=False)
+    return result
+
+
+def cached_fallback_search(query: str, filters: dict, limit: int, profile: dict) -> list:
+    """Fallback search cached on (query, filters, limit); the profile only feeds ranker prep"""
+    cache = load_result_cache('fallback_search')
+    key = stable_hash([query, filters, limit])
+    matches = cache.get(key)
+    if matches is None:
+        matches = asyncio.run(_search_and_prep(load_database(), query, filters, load_ranker(), profile, limit=limit))
+        # Empty results are retried on the next submission
+        if matches:
+            cache.put(key, matches)
+    return matches
+
+
 # --------------------------- #
 # Form - Student Profile
 # --------------------------- #
@@ -105,21 +413,11 @@ def create_profile_form():
 
     with col1:
         name = st.text_input("Full Name", placeholder="e.g., Priya Sharma")
-        origin_country = st.selectbox(
-            "Where are you from?",
-            ["India", "China", "USA", "UK", "Canada", "Nigeria", "Pakistan",
-             "Bangladesh", "Vietnam", "Other"]
-        )
+        origin_country = st.selectbox("Where are you from?", ORIGIN_COUNTRIES)
 
-        program = st.selectbox(
-            "Program of Interest",
-            ["Computer Science", "Data Science", "Business Analytics",
-             "Mechanical Engineering", "Electrical Engineering",
-             "Economics", "Psychology", "Renewable Energy",
-             "Biomedical Engineering", "Other"]
-        )
+        program = st.selectbox("Program of Interest", PROGRAMS)
 
-        level = st.selectbox("Study Level", ["bachelors", "masters", "phd"])
+        level = st.selectbox("Study Level", LEVELS)
 
         gpa = st.slider(
             "GPA / Academic Score (4.0 scale)",
@@ -132,9 +430,8 @@ def create_profile_form():
     with col2:
         target_countries = st.multiselect(
             "Preferred Countries",
-            ["USA", "UK", "Canada", "Germany", "Australia",
-             "Netherlands", "Sweden", "France", "Switzerland"],
-            default=["USA", "UK"]
+            TARGET_COUNTRIES,
+            default=DEFAULT_TARGET_COUNTRIES
         )
 
         budget = st.number_input(
@@ -183,129 +480,289 @@ def create_profile_form():
 # --------------------------- #
 # University Card Component
 # --------------------------- #
-def display_university_card(uni: dict, rank: int):
+# Numeric fields shown on recommendation cards
+CARD_NUMERIC_FIELDS = ('tuition_usd', 'final_score', 'acceptance_rate',
+                       'avg_class_size', 'living_cost_monthly', 'employment_rate_6mo')
+
+
+def coerce_number(value, default: float = 0.0) -> float:
+    """Coerce a single payload value to a number, returning default for blanks and junk"""
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def coerce_numeric_fields(universities: list) -> list:
+    """Coerce card numeric fields in one vectorized pass; missing/invalid values become 0"""
+    df = pd.DataFrame(universities)
+    for field in CARD_NUMERIC_FIELDS:
+        if field not in df.columns:
+            df[field] = 0
+    df[list(CARD_NUMERIC_FIELDS)] = (
+        df[list(CARD_NUMERIC_FIELDS)].apply(pd.to_numeric, errors='coerce').fillna(0)
+    )
+    return [
+        {**uni, **numeric}
+        for uni, numeric in zip(universities, df[list(CARD_NUMERIC_FIELDS)].to_dict('records'))
+    ]
+
+
+def build_card_views(universities: list) -> list:
+    """Precompute card views for a portfolio"""
+    return [build_card_view(uni) for uni in coerce_numeric_fields(universities)]
+
+
+def build_card_view(uni: dict) -> dict:
+    """Precompute the formatted strings shown on a recommendation card (expects coerced numeric fields)"""
+    tuition = uni['tuition_usd']
+    final_score = uni['final_score']
+    acceptance_rate = uni['acceptance_rate']
+    class_size = int(uni['avg_class_size'])
+    living_cost = uni['living_cost_monthly']
+    employment_rate = uni['employment_rate_6mo']
+
+    category = uni.get('category', 'Target')
+    tuition_fmt = f"${int(tuition):,}" if tuition > 0 else "N/A"
+    score_fmt = f"{final_score:.2%}" if final_score > 0 else "N/A"
+    living_cost_fmt = f"${int(living_cost):,}" if living_cost > 0 else "N/A"
+
+    def esc(value) -> str:
+        return html.escape(str(value))
+
+    scholarships = uni.get('scholarship_tags')
+    scholarships_html = (
+        f"<p><strong>Scholarships:</strong> {esc(scholarships)}</p>"
+        if scholarships and scholarships != 'none' else ""
+    )
+
+    # Collapse whitespace so blank lines in the description cannot end the HTML block
+    description = ' '.join(str(uni.get('description', '')).split())
+
+    # Everything except the rank is static per portfolio, so the card HTML is built once
+    body_html = f"""<p><strong>{esc(uni.get('program', ''))}</strong> ({esc(str(uni.get('level', '')).title())})</p>
+<div class='card-metrics'>
+<div><span>Country</span><strong>{esc(uni.get('country', 'Unknown'))}</strong></div>
+<div><span>Tuition</span><strong>{tuition_fmt}</strong></div>
+<div><span>Match Score</span><strong>{score_fmt}</strong></div>
+<div><span>Category</span><strong>{esc(category)}</strong></div>
+</div>
+<details>
+<summary>Detailed Breakdown</summary>
+<table>
+<tr>
+<td><strong>Academic Info:</strong><ul>
+<li>Acceptance Rate: {acceptance_rate * 100:.1f}%</li>
+<li>Research Output: {esc(uni.get('research_output', 'N/A'))}</li>
+<li>Average Class Size: {class_size if class_size > 0 else 'N/A'}</li>
+<li>Language: {esc(uni.get('language', 'N/A'))}</li>
+</ul></td>
+<td><strong>Practical Info:</strong><ul>
+<li>Application Deadline: {esc(uni.get('deadline', 'N/A'))}</li>
+<li>Living Cost: {living_cost_fmt}/month</li>
+<li>Visa Difficulty: {esc(uni.get('visa_difficulty', 'N/A'))}</li>
+<li>Employment Rate: {employment_rate * 100:.1f}%</li>
+</ul></td>
+</tr>
+</table>{scholarships_html}
+<p><strong>Program Description:</strong><br>{esc(description[:300])}...</p>
+</details>"""
+
+    return {
+        'title_html': f"{CATEGORY_EMOJI.get(category, '')} {esc(uni.get('univ_name', 'Unknown'))}",
+        'body_html': body_html,
+        # Content hash, so a card's container keeps its identity across reruns
+        'key': stable_hash(uni)[:16],
+    }
+
+
+# Radar layout is validated once at import; each card only fills in the trace data
+RADAR_TEMPLATE = go.Figure(go.Scatterpolar(fill='toself'))
+RADAR_TEMPLATE.update_layout(
+    polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+    showlegend=False,
+    height=300
+)
+
+
+@st.cache_data
+def build_radar_figure(breakdown: tuple):
+    """Build the score radar chart; cached on the (factor, score) pairs"""
+    fig = copy.deepcopy(RADAR_TEMPLATE)
+    fig.update_traces(
+        r=[score for _, score in breakdown],
+        theta=[name for name, _ in breakdown]
+    )
+    return fig
+
+
+def display_university_card(uni: dict, rank: int, view: dict = None):
     """Display a single university recommendation card"""
-    emoji_map = {'Reach': '🚀', 'Target': '🎯', 'Safety': '🛡️'}
-
-    with st.container():
-        st.markdown(f"""
-        <div class='metric-card'>
-                    <h3>{rank}. {emoji_map.get(uni.get('category', 'Target'), '')} {uni['univ_name']}</h3>
-        <p><strong>{uni['program']}</strong> ({uni['level'].title()})</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Country", uni.get('country', 'Unknown'))
-        
-        # Safely format tuition
-        tuition = uni.get('tuition_usd', 0)
-        if isinstance(tuition, str):
-            try:
-                tuition = float(tuition) if tuition and tuition != 'N/A' else 0
-            except (ValueError, TypeError):
-                tuition = 0
-        elif not isinstance(tuition, (int, float)):
-            tuition = 0
-        tuition_str = f"${int(tuition):,}" if tuition > 0 else "N/A"
-        col2.metric("Tuition", tuition_str)
-        
-        # Safely format match score
-        final_score = uni.get('final_score', 0)
-        if isinstance(final_score, str):
-            try:
-                final_score = float(final_score)
-            except (ValueError, TypeError):
-                final_score = 0
-        elif not isinstance(final_score, (int, float)):
-            final_score = 0
-        score_str = f"{final_score:.2%}" if final_score > 0 else "N/A"
-        col3.metric("Match Score", score_str)
-        
-        col4.metric("Category", uni.get('category', 'Target'))
+    view = view or build_card_views([uni])[0]
 
-        with st.expander("Detailed Breakdown"):
-            col_a, col_b = st.columns(2)
+    # One HTML block per card; only the radar chart needs a real widget
+    st.markdown(
+        f"<div class='metric-card'><h3>{rank}. {view['title_html']}</h3>{view['body_html']}</div>",
+        unsafe_allow_html=True
+    )
 
-            with col_a:
-                st.write("**Academic Info:**")
-                # Safely format acceptance rate
-                acceptance_rate = uni.get('acceptance_rate', 0)
-                if isinstance(acceptance_rate, str):
-                    try:
-                        acceptance_rate = float(acceptance_rate)
-                    except (ValueError, TypeError):
-                        acceptance_rate = 0
-                elif not isinstance(acceptance_rate, (int, float)):
-                    acceptance_rate = 0
-                st.write(f"- Acceptance Rate: {acceptance_rate * 100:.1f}%")
-                st.write(f"- Research Output: {uni.get('research_output', 'N/A')}")
-                
-                # Safely format class size
-                class_size = uni.get('avg_class_size', 0)
-                if isinstance(class_size, str):
-                    try:
-                        class_size = int(class_size)
-                    except (ValueError, TypeError):
-                        class_size = 0
-                elif not isinstance(class_size, (int, float)):
-                    class_size = 0
-                st.write(f"- Average Class Size: {class_size if class_size > 0 else 'N/A'}")
-                st.write(f"- Language: {uni.get('language', 'N/A')}")
-
-            with col_b:
-                st.write("**Practical Info:**")
-                st.write(f"- Application Deadline: {uni.get('deadline', 'N/A')}")
-                
-                # Safely format living cost
-                living_cost = uni.get('living_cost_monthly', 0)
-                if isinstance(living_cost, str):
-                    try:
-                        living_cost = float(living_cost) if living_cost and living_cost != 'N/A' else 0
-                    except (ValueError, TypeError):
-                        living_cost = 0
-                elif not isinstance(living_cost, (int, float)):
-                    living_cost = 0
-                living_cost_str = f"${int(living_cost):,}" if living_cost > 0 else "N/A"
-                st.write(f"- Living Cost: {living_cost_str}/month")
-                st.write(f"- Visa Difficulty: {uni.get('visa_difficulty', 'N/A')}")
-                
-                # Safely format employment rate
-                employment_rate = uni.get('employment_rate_6mo', 0)
-                if isinstance(employment_rate, str):
-                    try:
-                        employment_rate = float(employment_rate)
-                    except (ValueError, TypeError):
-                        employment_rate = 0
-                elif not isinstance(employment_rate, (int, float)):
-                    employment_rate = 0
-                st.write(f"- Employment Rate: {employment_rate * 100:.1f}%")
-
-            if uni.get('scholarship_tags') and uni['scholarship_tags'] != 'none':
-                st.write(f"**Scholarships:** {uni['scholarship_tags']}")
-
-            st.write("**Program Description:**")
-            st.write(uni['description'][:300] + "...")
-
-            # Score radar chart
-            if 'score_breakdown' in uni:
-                fig = go.Figure(data=go.Scatterpolar(
-                    r=list(uni['score_breakdown'].values()),
-                    theta=list(uni['score_breakdown'].keys()),
-                    fill='toself'
-                ))
-                fig.update_layout(
-                    polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-                    showlegend=False,
-                    height=300
-                )
-                st.plotly_chart(fig, use_container_width=True)
+    # Score radar chart, only built once the user asks for it
+    if 'score_breakdown' in uni:
+        toggle_key = f"radar_{rank}_{uni.get('univ_id', uni.get('univ_name'))}"
+        if st.toggle("Show score breakdown", key=toggle_key):
+            fig = build_radar_figure(tuple(uni['score_breakdown'].items()))
+            # Skip the Streamlit theme and modebar to keep the per-card payload small
+            st.plotly_chart(
+                fig, use_container_width=True, theme=None,
+                config={'displayModeBar': False}, key=f"{toggle_key}_chart"
+            )
 
 
 # --------------------------- #
 # Visualization Section
 # --------------------------- #
-def visualize_recommendations(universities: list):
+# Scatter points kept per country before plotting large portfolios
+MAX_SCATTER_POINTS_PER_COUNTRY = 500
+
+
+def _portfolio_key(universities: list) -> str:
+    """Content hash of a portfolio; computed once per search and used as its cache/widget key"""
+    return stable_hash(universities)[:16]
+
+
+@st.cache_data(show_spinner=False)
+def build_portfolio_figure(portfolio_key: str, _universities: list):
+    """Build the portfolio overview as one subplot figure, cached per portfolio key"""
+    universities = _universities
+    # Count categories/countries straight from the list; pandas is only needed for the scatter plot
+    category_counts = Counter(u['category'] for u in universities if u.get('category')).most_common()
+    country_counts = Counter(u['country'] for u in universities if u.get('country')).most_common()
+    country_names = [name for name, _ in country_counts]
+    country_values = [count for _, count in country_counts]
+
+    pie = None
+    pie_title = "University Categories"
+    if category_counts:
+        pie = go.Pie(
+            values=[count for _, count in category_counts],
+            labels=[name for name, _ in category_counts],
+            marker=dict(colors=[CATEGORY_COLORS.get(name) for name, _ in category_counts]),
+            showlegend=False
+        )
+    elif country_counts:
+        # If no category, show country distribution instead
+        pie_title = "Universities by Country"
+        pie = go.Pie(values=country_values, labels=country_names, showlegend=False)
+
+    scatter_traces = []
+    # Ensure required columns exist and are numeric
+    if any('tuition_usd' in u for u in universities) and any('final_score' in u for u in universities):
+        df = pd.DataFrame(universities)
+
+        # Downcast the plotted numbers to float32 to shrink the frame plotly serializes
+        df['tuition_usd'] = pd.to_numeric(df['tuition_usd'], errors='coerce').fillna(0).astype('float32')
+        df['final_score'] = pd.to_numeric(df['final_score'], errors='coerce').fillna(0).astype('float32')
+        
+        # Handle acceptance_rate
+        if 'acceptance_rate' in df.columns:
+            df['acceptance_rate'] = pd.to_numeric(df['acceptance_rate'], errors='coerce').fillna(0.5).astype('float32')
+        else:
+            df['acceptance_rate'] = pd.Series(0.5, index=df.index, dtype='float32')
+        
+        # Handle country
+        if 'country' not in df.columns:
+            df['country'] = 'Unknown'
+        
+        # Repeated labels are stored once as categoricals
+        for col in ('country', 'category', 'program'):
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        
+        # Downsample large portfolios, keeping the best-scoring programs per country
+        if len(df) > MAX_SCATTER_POINTS_PER_COUNTRY:
+            df = (
+                df.sort_values('final_score', ascending=False)
+                .groupby('country', observed=True)
+                .head(MAX_SCATTER_POINTS_PER_COUNTRY)
+            )
+        
+        # px still does the per-country split and marker sizing; its traces go into the subplot
+        scatter_traces = px.scatter(
+            df,
+            x='tuition_usd',
+            y='final_score',
+            size='acceptance_rate',
+            color='country',
+            hover_data=['univ_name', 'program'] if 'univ_name' in df.columns and 'program' in df.columns else [],
+            render_mode='webgl'
+        ).data
+
+    if pie is None and not scatter_traces and not country_counts:
+        return None
+
+    # Without a scatter plot the country counts take its slot instead of a duplicate bar row
+    show_bar_row = bool(scatter_traces) and bool(country_counts)
+    top_right_title = "Tuition vs Match Score" if scatter_traces else "Universities by Country"
+    if show_bar_row:
+        fig = make_subplots(
+            rows=2, cols=2,
+            specs=[[{'type': 'domain'}, {'type': 'xy'}], [{'type': 'xy', 'colspan': 2}, None]],
+            subplot_titles=(pie_title, top_right_title, "Universities by Country"),
+            vertical_spacing=0.15
+        )
+    else:
+        fig = make_subplots(
+            rows=1, cols=2,
+            specs=[[{'type': 'domain'}, {'type': 'xy'}]],
+            subplot_titles=(pie_title, top_right_title)
+        )
+
+    if pie is not None:
+        fig.add_trace(pie, row=1, col=1)
+
+    if scatter_traces:
+        for trace in scatter_traces:
+            fig.add_trace(trace, row=1, col=2)
+        fig.update_xaxes(title_text="Annual Tuition (USD)", row=1, col=2)
+        fig.update_yaxes(title_text="Match Score", row=1, col=2)
+    elif country_counts:
+        fig.add_trace(go.Bar(x=country_names, y=country_values, showlegend=False), row=1, col=2)
+        fig.update_xaxes(title_text="Country", row=1, col=2)
+        fig.update_yaxes(title_text="Count", row=1, col=2)
+
+    if show_bar_row:
+        fig.add_trace(
+            go.Bar(
+                x=country_names,
+                y=country_values,
+                marker=dict(color=country_values, colorscale='Viridis'),
+                showlegend=False
+            ),
+            row=2, col=1
+        )
+        fig.update_xaxes(title_text="Country", row=2, col=1)
+        fig.update_yaxes(title_text="Count", row=2, col=1)
+
+    fig.update_layout(height=800 if show_bar_row else 450, legend_title_text="Country")
+    return fig
+
+
+@st.cache_data(show_spinner=False)
+def build_csv(portfolio_key: str, _recommendations: list) -> bytes:
+    """Serialize recommendations to CSV once per portfolio key instead of on every rerun"""
+    df = pd.DataFrame(_recommendations)
+    # Arrow has no CSV type for mixed/nested object columns (e.g. score_breakdown), so write them as text
+    object_columns = df.columns[df.dtypes == object]
+    df[object_columns] = df[object_columns].astype('string')
+    # pyarrow's C++ CSV writer, straight into a bytes buffer
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    return buffer.getvalue()
+
+
+def visualize_recommendations(universities: list, portfolio_key: str = None):
     """Visualize recommendation results"""
     st.subheader("🎓 Portfolio Overview")
 
@@ -313,86 +770,15 @@ def visualize_recommendations(universities: list):
         st.warning("No recommendations to visualize.")
         return
 
-    df = pd.DataFrame(universities)
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        # Handle missing category field
-        if 'category' in df.columns:
-            category_counts = df['category'].value_counts()
-            fig_pie = px.pie(
-                values=category_counts.values,
-                names=category_counts.index,
-                title="University Categories",
-                color_discrete_map={'Reach': '#FF6B6B', 'Target': '#4ECDC4', 'Safety': '#95E1D3'}
-            )
-            st.plotly_chart(fig_pie, use_container_width=True)
-        else:
-            # If no category, show country distribution instead
-            if 'country' in df.columns:
-                country_counts = df['country'].value_counts()
-                fig_pie = px.pie(
-                    values=country_counts.values,
-                    names=country_counts.index,
-                    title="Universities by Country"
-                )
-                st.plotly_chart(fig_pie, use_container_width=True)
-            else:
-                st.info("No category data available for visualization.")
+    # The cached figure is looked up by key, so reruns don't re-hash the whole portfolio
+    portfolio_key = portfolio_key or _portfolio_key(universities)
 
-    with col2:
-        # Ensure required columns exist and are numeric
-        if 'tuition_usd' in df.columns and 'final_score' in df.columns:
-            # Convert to numeric, handling strings
-            df['tuition_usd'] = pd.to_numeric(df['tuition_usd'], errors='coerce').fillna(0)
-            df['final_score'] = pd.to_numeric(df['final_score'], errors='coerce').fillna(0)
-            
-            # Handle acceptance_rate
-            if 'acceptance_rate' in df.columns:
-                df['acceptance_rate'] = pd.to_numeric(df['acceptance_rate'], errors='coerce').fillna(0.5)
-            else:
-                df['acceptance_rate'] = 0.5
-            
-            # Handle country
-            if 'country' not in df.columns:
-                df['country'] = 'Unknown'
-            
-            fig_scatter = px.scatter(
-                df,
-                x='tuition_usd',
-                y='final_score',
-                size='acceptance_rate',
-                color='country',
-                hover_data=['univ_name', 'program'] if 'univ_name' in df.columns and 'program' in df.columns else [],
-                title="Tuition vs Match Score",
-                labels={'tuition_usd': 'Annual Tuition (USD)', 'final_score': 'Match Score'}
-            )
-            st.plotly_chart(fig_scatter, use_container_width=True)
-        else:
-            st.info("Insufficient data for scatter plot. Showing country distribution instead.")
-            if 'country' in df.columns:
-                country_counts = df['country'].value_counts()
-                fig_bar = px.bar(
-                    x=country_counts.index,
-                    y=country_counts.values,
-                    title="Universities by Country",
-                    labels={'x': 'Country', 'y': 'Count'}
-                )
-                st.plotly_chart(fig_bar, use_container_width=True)
-
-    # Country distribution bar chart
-    if 'country' in df.columns:
-        country_counts = df['country'].value_counts()
-        fig_bar = px.bar(
-            x=country_counts.index,
-            y=country_counts.values,
-            title="Universities by Country",
-            labels={'x': 'Country', 'y': 'Count'},
-            color=country_counts.values,
-            color_continuous_scale='Viridis'
-        )
-        st.plotly_chart(fig_bar, use_container_width=True)
+    # Pie, scatter and country bars go out as one figure: one payload, one layout pass
+    fig = build_portfolio_figure(portfolio_key, universities)
+    if fig is None:
+        st.info("No category data available for visualization.")
+        return
+    st.plotly_chart(fig, use_container_width=True, key=f"portfolio_{portfolio_key}")
 
 
 # --------------------------- #
@@ -402,6 +788,12 @@ def main():
     st.markdown("<h1 style='text-align:center;'>🎓 AI University Recommender</h1>", unsafe_allow_html=True)
     st.markdown("<p style='text-align:center; font-size:18px;'>Find your perfect university match powered by AI</p>", unsafe_allow_html=True)
 
+    # Resolve the shared database handle once per rerun
+    try:
+        db, db_error = load_database(), None
+    except Exception as e:
+        db, db_error = None, e
+
     # Sidebar
     with st.sidebar:
         st.image("https://via.placeholder.com/300x100.png?text=UniMatch+AI", use_container_width=True)
@@ -413,19 +805,17 @@ def main():
         - **Multi-Agent AI** (CrewAI)
         - **Smart Ranking** algorithms
         """)
-        try:
-            db = load_database()
+        if db is None:
+            st.error(f"Database connection error: {str(db_error)}")
+            st.metric("Universities Indexed", "Error")
+        else:
             # Check if collection exists and get info
             try:
-                collection_info = db.client.get_collection(db.collection_name)
-                st.metric("Universities Indexed", collection_info.points_count)
+                st.metric("Universities Indexed", get_points_count(db.collection_name))
             except Exception as e:
                 st.warning(f"⚠️ Could not connect to Qdrant: {str(e)}")
-                st.info("💡 Make sure Qdrant is running: `docker run -p 6333:6333 qdrant/qdrant`")
+                st.info("💡 Make sure Qdrant is running: `docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant`")
                 st.metric("Universities Indexed", "N/A")
-        except Exception as e:
-            st.error(f"Database connection error: {str(e)}")
-            st.metric("Universities Indexed", "Error")
 
         if st.session_state.search_history:
             st.metric("Your Searches", len(st.session_state.search_history))
@@ -442,7 +832,8 @@ def main():
             else:
                 with st.spinner("AI agents are analyzing your profile..."):
                     try:
-                        db = load_database()
+                        if db is None:
+                            raise RuntimeError(f"Database connection error: {db_error}")
                         
                         # Verify collection exists and is properly configured
                         if not db.verify_collection():
@@ -452,18 +843,24 @@ def main():
                                     try:
                                         db.create_collection()
                                         db.load_universities('data/raw/universities_sample.csv')
+                                        get_points_count.clear()
                                         st.success("✅ Database reinitialized successfully!")
                                         st.rerun()
                                     except Exception as e:
                                         st.error(f"Failed to reinitialize: {e}")
                             return
                         
-                        # Use the new pipeline approach - matches article structure
-                        from src.crew.coordinator import UniversityRecommendationCrew
-                        crew = load_crew(db)
-                        
-                        # Run the recommendation pipeline
-                        result = crew.run_recommendation_process(profile)
+                        # Identical profiles are served from cache; otherwise stream the pipeline stage by stage
+                        profile_key = make_profile_key(profile)
+                        prefetched_fallback = None
+                        result = cached_pipeline(profile_key)
+                        if result is None:
+                            # Run the fallback search alongside the pipeline so it's ready if the pipeline comes back empty
+                            prefetched_fallback = load_executor().submit(
+                                db.search_universities, *fallback_search_args(profile), 20
+                            )
+                            result = stream_pipeline(load_crew(db), profile)
+                            store_pipeline(profile_key, result)
                         
                         # Extract matches from pipeline result
                         matches = result.get('recommendations', {}).get('matches', [])
@@ -472,24 +869,18 @@ def main():
                         if not matches or len(matches) == 0:
                             st.info("🔄 Pipeline returned no matches. Trying direct search with relaxed filters...")
                             try:
-                                # Build query
-                                program = profile.get('program', '')
-                                interests = profile.get('interests', [])
-                                if isinstance(interests, list):
-                                    interests_str = ' '.join(interests[:3])
-                                else:
-                                    interests_str = str(interests)
-                                query = f"{program} {interests_str}".strip()
+                                query, filters = fallback_search_args(profile)
                                 
-                                # Try search with only level filter (most important)
-                                level = profile.get('level', '')
-                                filters = {'level': level} if level else None
-                                
-                                matches = db.search_universities(query, filters, limit=20)
+                                # Use the prefetched search if it already found something
+                                if prefetched_fallback is not None:
+                                    try:
+                                        matches = prefetched_fallback.result()
+                                    except Exception as e:
+                                        logging.warning(f"Prefetched fallback search failed: {e}")
                                 
+                                # Filtered and unfiltered searches run together; unfiltered is used if filtered is empty
                                 if not matches:
-                                    # Try without any filters
-                                    matches = db.search_universities(query, None, limit=20)
+                                    matches = cached_fallback_search(query, filters, 20, profile)
                                 
                                 if matches:
                                     st.success(f"✅ Found {len(matches)} matches with relaxed filters!")
@@ -503,19 +894,9 @@ def main():
                                 st.json(profile)
                                 st.write("**Search query would be:**")
                                 program = profile.get('program', '')
-                                interests = profile.get('interests', [])
-                                if isinstance(interests, list):
-                                    interests_str = ', '.join(interests)
-                                else:
-                                    interests_str = str(interests)
-                                query = f"{program} {interests_str}"
+                                query, filters_info = profile_query_and_filters(profile)
                                 st.code(query)
                                 st.write("**Filters applied:**")
-                                filters_info = {
-                                    "countries": profile.get('target_countries', []),
-                                    "max_tuition": profile.get('budget'),
-                                    "level": profile.get('level')
-                                }
                                 st.json(filters_info)
                                 
                                 # Try a direct search to see if Qdrant is working
@@ -524,6 +905,7 @@ def main():
                                     test_query = program or "Computer Science"
                                     test_results = db.search_universities(test_query, None, limit=5)
                                     if test_results:
+                                        test_results = coerce_numeric_fields(test_results)
                                         st.success(f"✅ Qdrant is working! Found {len(test_results)} results for '{test_query}'")
                                         st.write("Sample results:")
                                         for i, r in enumerate(test_results[:3], 1):
@@ -547,34 +929,24 @@ def main():
                                         test_countries = profile.get('target_countries', [])
                                         test_budget = profile.get('budget', 0)
                                         
-                                        # Check sample results against filters
-                                        matching_level = [r for r in test_results if r.get('level', '').lower() == test_level.lower()]
-                                        matching_countries = [r for r in test_results if r.get('country') in test_countries]
-                                        
-                                        # Safely check budget - handle string/numeric types
-                                        matching_budget = []
-                                        for r in test_results:
-                                            tuition = r.get('tuition_usd', 0)
-                                            # Convert to numeric if possible
-                                            if isinstance(tuition, str):
-                                                try:
-                                                    tuition = float(tuition) if tuition and tuition != 'N/A' else 0
-                                                except (ValueError, TypeError):
-                                                    tuition = 0
-                                            elif not isinstance(tuition, (int, float)):
-                                                tuition = 0
-                                            
-                                            if isinstance(tuition, (int, float)) and tuition > 0 and tuition <= test_budget * 1.2:
-                                                matching_budget.append(r)
+                                        # Score all sample results against the filters in one vectorized pass
+                                        tdf = pd.DataFrame(test_results)
+                                        tuition = pd.to_numeric(tdf['tuition_usd'], errors='coerce').fillna(0)
+                                        level_mask = tdf['level'].fillna('').astype(str).str.lower() == str(test_level).lower()
+                                        country_mask = tdf['country'].isin(test_countries)
+                                        budget_mask = (tuition > 0) & (tuition <= test_budget * 1.2)
+                                        matching_level = int(level_mask.sum())
+                                        matching_countries = int(country_mask.sum())
+                                        matching_budget = int(budget_mask.sum())
                                         
-                                        st.write(f"- Results matching level '{test_level}': {len(matching_level)}/{len(test_results)}")
-                                        st.write(f"- Results matching countries {test_countries}: {len(matching_countries)}/{len(test_results)}")
-                                        st.write(f"- Results within budget ${test_budget:,} (+20% buffer): {len(matching_budget)}/{len(test_results)}")
+                                        st.write(f"- Results matching level '{test_level}': {matching_level}/{len(test_results)}")
+                                        st.write(f"- Results matching countries {test_countries}: {matching_countries}/{len(test_results)}")
+                                        st.write(f"- Results within budget ${test_budget:,} (+20% buffer): {matching_budget}/{len(test_results)}")
                                         
-                                        if len(matching_budget) == 0 and test_budget > 0:
-                                            tuition_values = [r.get('tuition_usd', 0) for r in test_results if isinstance(r.get('tuition_usd'), (int, float)) and r.get('tuition_usd', 0) > 0]
-                                            if tuition_values:
-                                                min_tuition = min(tuition_values)
+                                        if matching_budget == 0 and test_budget > 0:
+                                            positive_tuition = tuition[tuition > 0]
+                                            if not positive_tuition.empty:
+                                                min_tuition = positive_tuition.min()
                                                 st.warning(f"💡 Your budget of ${int(test_budget):,} might be too low. Sample results show minimum tuition of ${int(min_tuition):,}. Try increasing your budget or removing the budget filter.")
                                             else:
                                                 st.warning(f"💡 Your budget of ${int(test_budget):,} might be too restrictive. Try increasing your budget or removing the budget filter.")
@@ -582,14 +954,13 @@ def main():
                                         st.warning("⚠️ Qdrant search returned no results even without filters")
                                 except Exception as e:
                                     st.error(f"❌ Qdrant search error: {e}")
-                                    import traceback
                                     st.code(traceback.format_exc())
                         
                         portfolio = None
                         if matches and len(matches) > 0:
                             # Use ranker for additional ranking if available
                             try:
-                                ranker = UniversityRanker()
+                                ranker = load_ranker()
                                 ranked = ranker.rank_universities(matches, profile)
                                 portfolio = ranker.balance_portfolio(ranked)
                             except Exception as e:
@@ -601,12 +972,7 @@ def main():
                                 for uni in portfolio:
                                     if 'category' not in uni:
                                         # Simple categorization based on acceptance rate
-                                        acceptance = uni.get('acceptance_rate', 0.5)
-                                        if isinstance(acceptance, str):
-                                            try:
-                                                acceptance = float(acceptance)
-                                            except:
-                                                acceptance = 0.5
+                                        acceptance = coerce_number(uni.get('acceptance_rate'), 0.5)
                                         
                                         if acceptance > 0.4:
                                             uni['category'] = 'Safety'
@@ -617,31 +983,25 @@ def main():
                                     
                                     if 'final_score' not in uni:
                                         # Use similarity score as fallback
-                                        score = uni.get('similarity_score', 0.5)
-                                        if isinstance(score, str):
-                                            try:
-                                                score = float(score)
-                                            except:
-                                                score = 0.5
-                                        uni['final_score'] = score
+                                        uni['final_score'] = coerce_number(uni.get('similarity_score'), 0.5)
                             
                             # Ensure portfolio is not empty
                             if portfolio and len(portfolio) > 0:
                                 st.session_state.recommendations = portfolio
-                                if profile not in st.session_state.search_history:
-                                    st.session_state.search_history.append(profile)
+                                st.session_state.recommendation_views = build_card_views(portfolio)
+                                st.session_state.recommendations_key = _portfolio_key(portfolio)
+                                record_search(profile)
 
                                 st.success(f"✅ Found {len(portfolio)} great matches for you!")
-                                st.balloons()
+                                if os.getenv("APP_ENV", "dev") != "prod":
+                                    st.balloons()
                                 
                                 # Show application plan - update with actual match count
                                 plan = result.get('recommendations', {}).get('plan', '')
                                 if plan:
                                     # Update the plan with actual number of matches
-                                    import re
                                     # Replace "Target 0 programs" or any number with actual count
-                                    updated_plan = re.sub(
-                                        r'Target \d+ programs',
+                                    updated_plan = TARGET_PROGRAMS_RE.sub(
                                         f'Target {len(portfolio)} programs',
                                         plan
                                     )
@@ -650,10 +1010,8 @@ def main():
                                         st.markdown(updated_plan)
                                 else:
                                     # Generate a new plan if one doesn't exist
-                                    from src.agents.counselor import CounselorAgent
-                                    from src.utils.groq_llm import create_groq_llm
-                                    counselor = CounselorAgent(create_groq_llm())
-                                    new_plan = counselor.create_plan(portfolio, profile)
+                                    portfolio_key = tuple(sorted(str(u.get('univ_id', u.get('univ_name'))) for u in portfolio))
+                                    new_plan = cached_plan(make_profile_key(profile), portfolio_key, portfolio, profile)
                                     with st.expander("📋 Application Plan", expanded=False):
                                         st.markdown(new_plan)
                                 
@@ -671,27 +1029,29 @@ def main():
 
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
-                        import traceback
                         with st.expander("Error Details"):
                             st.code(traceback.format_exc())
-                        st.info("💡 Make sure Qdrant is running: `docker run -p 6333:6333 qdrant/qdrant`")
+                        st.info("💡 Make sure Qdrant is running: `docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant`")
 
     # --- Tab 2 ---
     with tab2:
         if st.session_state.recommendations:
             st.markdown("## 🎯 Your Personalized University Portfolio")
-            visualize_recommendations(st.session_state.recommendations)
+            recommendations_key = st.session_state.recommendations_key or _portfolio_key(st.session_state.recommendations)
+            visualize_recommendations(st.session_state.recommendations, recommendations_key)
             st.markdown("---")
             st.markdown("## 🏫 Detailed Recommendations")
 
-            for idx, uni in enumerate(st.session_state.recommendations, 1):
-                display_university_card(uni, idx)
+            views = st.session_state.recommendation_views or [None] * len(st.session_state.recommendations)
+            for idx, (uni, view) in enumerate(zip(st.session_state.recommendations, views), 1):
+                view = view or build_card_views([uni])[0]
+                # Keyed on rank + content so unchanged cards map onto the same frontend element
+                with st.container(key=f"card_{idx}_{view['key']}"):
+                    display_university_card(uni, idx, view)
 
-            df_download = pd.DataFrame(st.session_state.recommendations)
-            csv = df_download.to_csv(index=False)
             st.download_button(
                 label="📥 Download Recommendations (CSV)",
-                data=csv,
+                data=build_csv(recommendations_key, st.session_state.recommendations),
                 file_name=f"university_recommendations_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
@@ -1,18 +1,48 @@
+import itertools
+import os
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
-from tqdm import tqdm
 
-def generate_sample_data():
-    """Generate realistic university dataset"""
+COLUMNS = ['univ_id', 'univ_name', 'country', 'program', 'level', 'tuition_usd', 'deadline', 'language',
+           'acceptance_rate', 'scholarship_tags', 'description', 'qs_ranking', 'research_output',
+           'living_cost_monthly', 'visa_difficulty', 'avg_class_size', 'employment_rate_6mo']
+CSV_CHUNK_ROWS = 10_000
+LOCAL_LANGUAGES = {'Germany': 'German', 'Sweden': 'Swedish', 'Netherlands': 'Dutch'}
+
+
+def _description_tail(level):
+    """Description text following "The {program} program at {uni_name}" for a study level"""
+    description = f"""offers a cutting-edge curriculum focusing on
+                    theoretical foundations and practical applications. Students benefit from world-class
+                    faculty, state-of-the-art research facilities, and strong industry connections.
+                    The program emphasizes {'research methodology' if level == 'masters' else 'foundational skills'}
+                    and prepares graduates for {'advanced research or industry leadership' if level == 'masters' else 'successful careers'}.
+
+                    Entry requirements: {'Bachelor degree with 2:1 or equivalent, relevant experience preferred' if level == 'masters'
+                    else 'High school diploma with strong grades in relevant subjects'}.
+
+                    Career prospects: Graduates typically find positions in {'senior roles at tech companies, research institutions, or pursue PhD studies'
+                    if level == 'masters' else 'entry to mid-level positions across various industries'}.
+                    """
+    return ' ' + description.strip()
+
+
+# Rendered once at import; rows only concatenate program and university names onto them
+DESCRIPTION_TAILS = {level: _description_tail(level) for level in ('bachelors', 'masters', 'phd')}
+
+def generate_sample_data(seed=None, embed=True):
+    """Generate realistic university dataset
+
+    Args:
+        seed: Optional seed for the NumPy generator, for reproducible datasets
+        embed: Also precompute program embeddings so ingest can skip the encoder
+    """
     countries = ['UK', 'USA', 'Canada', 'Germany', 'Australia', 'Netherlands', 'Sweden']
     programs = ['Computer Science', 'Data Science', 'Renewable Energy', 'Business Analytics',
                 'Mechanical Engineering', 'Biomedical Engineering', 'Economics', 'Psychology']
     levels = ['bachelors', 'masters', 'phd']
     languages = ['English', 'German', 'Swedish', 'Dutch']
 
-    universities = []
-
     uni_names = {
         'UK': ['Oxford University', 'Cambridge University', 'Imperial College London', 'UCL', 'Edinburgh University'],
         'USA': ['MIT', 'Stanford University', 'Harvard University', 'UC Berkeley', 'Carnegie Mellon'],
@@ -33,83 +63,91 @@ def generate_sample_data():
         'Sweden': (0, 15000)
     }
 
-    id_counter = 1
-    for country in tqdm(countries, desc="Generating universities"):
-        for uni_name in uni_names[country]:
-            for program in programs[:4]:  # 4 programs per university
-                for level in levels[:2]:  # bachelors and masters
-
-                    tuition = random.randint(*tuition_ranges[country])
-
-                    # Determine language
-                    lang = 'English'
-                    if country == 'Germany':
-                        lang = random.choice(['English', 'German'])
-                    elif country == 'Sweden':
-                        lang = random.choice(['English', 'Swedish'])
-                    elif country == 'Netherlands':
-                        lang = random.choice(['English', 'Dutch'])
-
-                    # Generate deadline
-                    deadline = datetime.now() + timedelta(days=random.randint(30, 365))
-
-                    # Acceptance rate proxy
-                    acceptance = round(random.uniform(0.05, 0.45), 2)
-
-                    # Scholarship tags
-                    scholarships = []
-                    if random.random() > 0.5:
-                        scholarships.append('merit_based')
-                    if random.random() > 0.6:
-                        scholarships.append('need_based')
-                    if country in ['UK', 'Canada', 'Australia']:
-                        if random.random() > 0.7:
-                            scholarships.append('commonwealth')
-
-                    # Always ensure at least one scholarship tag
-                    if 'merit_based' not in scholarships:
-                        scholarships.append('merit_based')
-
-                    # Generate detailed description
-                    description = f"""
-                    The {program} program at {uni_name} offers a cutting-edge curriculum focusing on
-                    theoretical foundations and practical applications. Students benefit from world-class
-                    faculty, state-of-the-art research facilities, and strong industry connections.
-                    The program emphasizes {'research methodology' if level == 'masters' else 'foundational skills'}
-                    and prepares graduates for {'advanced research or industry leadership' if level == 'masters' else 'successful careers'}.
-
-                    Entry requirements: {'Bachelor degree with 2:1 or equivalent, relevant experience preferred' if level == 'masters'
-                    else 'High school diploma with strong grades in relevant subjects'}.
+    # Cross join country/university x program x level in the same order as a nested loop
+    pairs = [(country, uni_name) for country in countries for uni_name in uni_names[country]]
+    rows = [(country, uni_name, program, level)
+            for (country, uni_name), program, level in itertools.product(pairs, programs[:4], levels[:2])]
+    df = pd.DataFrame(rows, columns=['country', 'univ_name', 'program', 'level'])
+    n = len(df)
+    # One PCG64 generator drives every random column
+    rng = np.random.default_rng(seed)
+
+    df['univ_id'] = df['country'].str.lower().str[:3] + '-' + pd.Series(np.arange(1, n + 1)).astype(str).str.zfill(3)
+
+    # Per-country lookups are built once and gathered by country code
+    country_codes = pd.Categorical(df['country'], categories=countries).codes
+    tuition_bounds = np.array([tuition_ranges[country] for country in countries])
+    local_languages = np.array([LOCAL_LANGUAGES.get(country, '') for country in countries], dtype=object)
+
+    low, high = tuition_bounds[country_codes].T
+    df['tuition_usd'] = rng.integers(low, high, endpoint=True)
+
+    # Generate deadline
+    days = rng.integers(30, 365, size=n, endpoint=True)
+    df['deadline'] = (pd.Timestamp.now() + pd.to_timedelta(days, unit='D')).strftime('%Y-%m-%d')
+
+    # Determine language: countries with a local language teach in it about half the time
+    local_language = local_languages[country_codes]
+    df['language'] = np.where((local_language != '') & (rng.random(n) < 0.5), local_language, 'English')
+
+    # Acceptance rate proxy
+    df['acceptance_rate'] = np.round(rng.uniform(0.05, 0.45, n), 2)
+
+    # Scholarship tags; merit_based is always present, appended last if it wasn't drawn
+    merit_drawn = rng.random(n) > 0.5
+    need_based = rng.random(n) > 0.6
+    commonwealth = df['country'].isin(['UK', 'Canada', 'Australia']).to_numpy() & (rng.random(n) > 0.7)
+    df['scholarship_tags'] = (
+        pd.Series(np.where(merit_drawn, 'merit_based,', ''))
+        + np.where(need_based, 'need_based,', '')
+        + np.where(commonwealth, 'commonwealth,', '')
+        + np.where(merit_drawn, '', 'merit_based')
+    ).str.rstrip(',')
+
+    # Generate detailed description
+    df['description'] = (
+        'The ' + df['program'] + ' program at ' + df['univ_name']
+        + df['level'].map(DESCRIPTION_TAILS)
+    )
+
+    df['qs_ranking'] = np.where(rng.random(n) > 0.3, rng.integers(20, 500, size=n, endpoint=True), np.nan)
+    df['research_output'] = rng.choice(['Very High', 'High', 'Medium', 'Good'], n)
+    df['living_cost_monthly'] = rng.integers(800, 2500, size=n, endpoint=True)
+    df['visa_difficulty'] = rng.choice(['Easy', 'Moderate', 'Challenging'], n)
+    df['avg_class_size'] = rng.integers(15, 80, size=n, endpoint=True)
+    df['employment_rate_6mo'] = np.round(rng.uniform(0.70, 0.95, n), 2)
+    df = df[COLUMNS]
+
+    # Stream rows to disk in chunks rather than serializing the whole frame at once
+    df.to_csv('data/raw/universities_sample.csv', index=False, chunksize=CSV_CHUNK_ROWS)
+    print(f"Generated {len(df)} university programs")
+
+    if embed:
+        save_embeddings(df, 'data/raw/universities_sample.csv')
+    return df
 
-                    Career prospects: Graduates typically find positions in {'senior roles at tech companies, research institutions, or pursue PhD studies'
-                    if level == 'masters' else 'entry to mid-level positions across various industries'}.
-                    """
 
-                    universities.append({
-                        'univ_id': f'{country.lower()[:3]}-{id_counter:03d}',
-                        'univ_name': uni_name,
-                        'country': country,
-                        'program': program,
-                        'level': level,
-                        'tuition_usd': tuition,
-                        'deadline': deadline.strftime('%Y-%m-%d'),
-                        'language': lang,
-                        'acceptance_rate': acceptance,
-                        'scholarship_tags': ','.join(scholarships) if scholarships else 'none',
-                        'description': description.strip(),
-                        'qs_ranking': random.randint(20, 500) if random.random() > 0.3 else None,
-                        'research_output': random.choice(['Very High', 'High', 'Medium', 'Good']),
-                        'living_cost_monthly': random.randint(800, 2500),
-                        'visa_difficulty': random.choice(['Easy', 'Moderate', 'Challenging']),
-                        'avg_class_size': random.randint(15, 80),
-                        'employment_rate_6mo': round(random.uniform(0.70, 0.95), 2)
-                    })
-                    id_counter += 1
-
-    df = pd.DataFrame(universities)
-    df.to_csv('data/raw/universities_sample.csv', index=False)
-    print(f"Generated {len(universities)} university programs")
-    return df
+def save_embeddings(df, csv_path):
+    """Encode every program once and save the vectors next to the data for load_universities"""
+    try:
+        from src.database.qdrant_client import (
+            EMBEDDINGS_PATH, EMBEDDINGS_META_PATH, UniversityVectorDB, load_encoder, save_embeddings_metadata
+        )
+    except ImportError as e:
+        print(f"Skipping embedding precomputation: {e}")
+        return
+
+    # Same text UniversityVectorDB.load_universities embeds: "univ_name | program | description"
+    texts = UniversityVectorDB.prepare_search_texts(df)
+    encoder = load_encoder()
+    vectors = encoder.encode(
+        texts, batch_size=64, show_progress_bar=False, convert_to_numpy=True, normalize_embeddings=True
+    )
+    os.makedirs(os.path.dirname(EMBEDDINGS_PATH), exist_ok=True)
+    np.save(EMBEDDINGS_PATH, vectors.astype(np.float32))
+    # load_universities only reuses the vectors for this exact CSV and encoder configuration
+    save_embeddings_metadata(EMBEDDINGS_META_PATH, csv_path, encoder)
+    print(f"Saved {len(vectors)} embeddings to {EMBEDDINGS_PATH}")
 
 if __name__ == "__main__":
     df = generate_sample_data()
@@ -8,6 +8,9 @@ import os
 import sys
 import subprocess
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import distribution, PackageNotFoundError
 from pathlib import Path
 
 # Get the project root directory
@@ -17,25 +20,34 @@ PROJECT_ROOT = Path(__file__).parent.absolute()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for Qdrant to come up during initialization
+QDRANT_READY_TIMEOUT = 30
+
+# Distribution names of the packages the system needs
+REQUIRED_PACKAGES = [
+    'pandas', 'numpy', 'streamlit', 'plotly', 'qdrant-client',
+    'sentence-transformers', 'crewai', 'openai'
+]
+
 def check_requirements():
     """Check if all required packages are installed"""
     logger.info("Checking requirements...")
     
-    try:
-        import pandas
-        import numpy
-        import streamlit
-        import plotly
-        import qdrant_client
-        import sentence_transformers
-        import crewai
-        import openai
-        logger.info(" All required packages are installed")
-        return True
-    except ImportError as e:
-        logger.error(f" Missing package: {e}")
+    # Read installed-package metadata instead of importing (sentence_transformers pulls in torch)
+    missing = []
+    for package in REQUIRED_PACKAGES:
+        try:
+            distribution(package)
+        except PackageNotFoundError:
+            missing.append(package)
+    
+    if missing:
+        logger.error(f" Missing packages: {', '.join(missing)}")
         logger.info("Please run: pip install -r requirements.txt")
         return False
+    
+    logger.info(" All required packages are installed")
+    return True
 
 def create_directories():
     """Create necessary directories"""
@@ -78,6 +90,29 @@ def generate_sample_data():
         logger.error(traceback.format_exc())
         return False
 
+def wait_for_qdrant_ready(timeout: float = QDRANT_READY_TIMEOUT) -> bool:
+    """Poll Qdrant until it answers or the timeout expires"""
+    logger.info("Waiting for Qdrant...")
+    from qdrant_client import QdrantClient
+    
+    client = QdrantClient(
+        host=os.getenv('QDRANT_HOST', 'localhost'),
+        port=int(os.getenv('QDRANT_PORT', 6333)),
+        timeout=5
+    )
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client.get_collections()
+            logger.info("✅ Qdrant is reachable")
+            return True
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                logger.error(f"❌ Qdrant not reachable: {e}")
+                logger.error("   Make sure Qdrant is running: docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant")
+                return False
+            time.sleep(1)
+
 def setup_qdrant():
     """Setup Qdrant vector database"""
     logger.info("Setting up Qdrant...")
@@ -119,7 +154,7 @@ def setup_qdrant():
             
     except ConnectionError as e:
         logger.error(f"❌ Failed to connect to Qdrant: {e}")
-        logger.error("   Make sure Qdrant is running: docker run -p 6333:6333 qdrant/qdrant")
+        logger.error("   Make sure Qdrant is running: docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant")
         return False
     except Exception as e:
         logger.error(f"❌ Failed to setup Qdrant: {e}")
@@ -193,14 +228,21 @@ def main():
         logger.error("Please install requirements first: pip install -r requirements.txt")
         return False
     
-    # Step 2: Create directories
-    create_directories()
+    # Steps 2-3: Create directories and generate sample data while waiting for Qdrant
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        directories_ready = executor.submit(create_directories)
+        data_ready = executor.submit(generate_sample_data)
+        qdrant_ready = executor.submit(wait_for_qdrant_ready)
     
-    # Step 3: Generate sample data
-    if not generate_sample_data():
+    directories_ready.result()
+    if not data_ready.result():
         logger.error("Failed to generate sample data")
         return False
     
+    if not qdrant_ready.result():
+        logger.error("Failed to setup Qdrant")
+        return False
+    
     # Step 4: Setup Qdrant
     if not setup_qdrant():
         logger.error("Failed to setup Qdrant")
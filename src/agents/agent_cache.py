@@ -0,0 +1,35 @@
+"""
+Shared CrewAI Agent instances
+Agent wrappers hold no per-student state, so one Agent per (wrapper, LLM) is reused
+"""
+
+import threading
+from typing import Dict, Tuple
+
+from crewai import Agent
+
+
+_AGENT_CACHE: Dict[Tuple[str, int], Tuple[object, Agent]] = {}
+_AGENT_LOCK = threading.Lock()
+
+
+def cached_agent(owner: str, llm, **agent_kwargs) -> Agent:
+    """
+    Return the Agent for this wrapper and LLM, constructing it on first use.
+    
+    Args:
+        owner: Name of the wrapper class (e.g. 'MatcherAgent')
+        llm: LLM the Agent runs on
+        **agent_kwargs: Agent constructor arguments other than llm
+        
+    Returns:
+        Agent shared by every wrapper of this kind built on the same LLM
+    """
+    key = (owner, id(llm))
+    with _AGENT_LOCK:
+        entry = _AGENT_CACHE.get(key)
+        # The LLM is kept alive alongside the Agent, so a matching id is the same object
+        if entry is None or entry[0] is not llm:
+            entry = (llm, Agent(llm=llm, **agent_kwargs))
+            _AGENT_CACHE[key] = entry
+        return entry[1]
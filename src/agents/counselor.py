@@ -1,41 +1,27 @@
-from crewai import Agent, Task
+from crewai import Task
+from functools import lru_cache
 from typing import Dict, List
-import json
 
+from src.agents.agent_cache import cached_agent
+from src.utils.profile import coerce_list
 
-class CounselorAgent:
-    def __init__(self, llm):
-        self.agent = Agent(
-            role="University Admissions Counselor",
-            goal="Provide personalized, actionable advice and create application timelines",
-            backstory="""You are a seasoned university counselor with 15 years of experience 
-            helping students navigate the complex application process. You provide clear, 
-            empathetic guidance and create realistic timelines.""",
-            llm=llm,
-            verbose=True,
-            allow_delegation=False
-        )
 
-    def create_plan(self, matches: List[Dict], student_profile: Dict) -> str:
-        """Create application plan - matches article structure"""
-        name = student_profile.get('name', 'Student')
-        target_countries = student_profile.get('target_countries', [])
-        
-        # Handle countries - could be list or string
-        if isinstance(target_countries, str):
-            countries_list = [c.strip() for c in target_countries.split(',') if c.strip()]
-        elif isinstance(target_countries, list):
-            countries_list = [str(c).strip() for c in target_countries if c]
-        else:
-            countries_list = []
-        
-        first_country = countries_list[0] if countries_list else 'target countries'
-        num_matches = len(matches) if matches else 0
-        
-        num_countries = len(countries_list) if countries_list else 1
-        country_word = 'countries' if num_countries > 1 else 'country'
-        
-        plan = f"""
+# Fields (and column labels) sent to the LLM for each matched university
+UNIVERSITY_PROMPT_COLUMNS = (
+    ('univ_name', 'University'),
+    ('program', 'Program'),
+    ('country', 'Country'),
+    ('tuition_usd', 'Tuition (USD)'),
+    ('deadline', 'Deadline'),
+    ('final_score', 'Score'),
+)
+
+# Only the top-ranked matches are sent to the LLM for the advisory report
+ADVISORY_MAX_UNIVERSITIES = 10
+
+
+# Application plan template - only the profile-derived fields vary between students
+PLAN_TMPL = """
 ### Application Plan for {name}
 
 **Overview:**
@@ -63,12 +49,10 @@ class CounselorAgent:
 3. Start preparing required documents
 4. Apply for scholarships in parallel with university applications
 """
-        return plan
 
-    def create_advisory_task(self, student_profile: Dict, matched_universities: List) -> Task:
-        """Create task to generate personalized advice"""
-        return Task(
-            description=f"""
+
+# Advisory task description - filled with the formatted profile and universities
+ADVISORY_TMPL = """
             Create a comprehensive advisory report for this student including:
 
             1. **Personalized Recommendation Summary**
@@ -96,23 +80,92 @@ class CounselorAgent:
             5. **Next Steps** (immediate actions for next 2 weeks)
 
             Student Profile:
-            {self._format_profile(student_profile)}
+            {profile}
 
             Matched Universities:
-            {matched_universities}
+            {universities}
 
             Make the advice practical, encouraging, and specific.
-            """,
+            """
+
+
+@lru_cache(maxsize=128)
+def _render_plan(name: str, num_matches: int, num_countries: int, first_country: str) -> str:
+    """Fill PLAN_TMPL; identical plan inputs are rendered once"""
+    return PLAN_TMPL.format(
+        name=name,
+        num_matches=num_matches,
+        num_countries=num_countries,
+        country_word='countries' if num_countries > 1 else 'country',
+        first_country=first_country
+    )
+
+
+def _freeze_profile(profile: Dict) -> tuple:
+    """Hashable (key, value) pairs in profile order, with list values as tuples"""
+    return tuple(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in profile.items()
+    )
+
+
+@lru_cache(maxsize=1024)
+def _format_profile_items(items: tuple) -> str:
+    """Render frozen profile items; the same profile is formatted once per process"""
+    return "\n".join(
+        f"- {key.replace('_', ' ').title()}: {', '.join(map(str, value)) if isinstance(value, tuple) else value}"
+        for key, value in items
+    )
+
+
+class CounselorAgent:
+    def __init__(self, llm):
+        self.agent = cached_agent(
+            'CounselorAgent',
+            llm,
+            role="University Admissions Counselor",
+            goal="Provide personalized, actionable advice and create application timelines",
+            backstory="""You are a seasoned university counselor with 15 years of experience 
+            helping students navigate the complex application process. You provide clear, 
+            empathetic guidance and create realistic timelines.""",
+            verbose=True,
+            allow_delegation=False
+        )
+
+    def create_plan(self, matches: List[Dict], student_profile: Dict) -> str:
+        """Create application plan - matches article structure"""
+        name = student_profile.get('name', 'Student')
+        target_countries = student_profile.get('target_countries', [])
+        
+        countries_list = coerce_list(target_countries)
+        
+        first_country = countries_list[0] if countries_list else 'target countries'
+        num_matches = len(matches) if matches else 0
+        
+        num_countries = len(countries_list) if countries_list else 1
+        
+        return _render_plan(str(name), num_matches, num_countries, first_country)
+
+    def create_advisory_task(self, student_profile: Dict, matched_universities: List) -> Task:
+        """Create task to generate personalized advice"""
+        return Task(
+            description=ADVISORY_TMPL.format(
+                profile=self._format_profile(student_profile),
+                universities=self._format_universities(matched_universities)
+            ),
             agent=self.agent,
             expected_output="Comprehensive advisory report with timeline and action items"
         )
 
+    def _format_universities(self, universities: List[Dict]) -> str:
+        """Format the top matched universities as a compact table instead of a list-of-dicts repr"""
+        header = " | ".join(label for _, label in UNIVERSITY_PROMPT_COLUMNS)
+        rows = [
+            " | ".join(str(uni.get(key, 'N/A')) for key, _ in UNIVERSITY_PROMPT_COLUMNS)
+            for uni in (universities or [])[:ADVISORY_MAX_UNIVERSITIES]
+        ]
+        return "\n".join([header, *rows])
+
     def _format_profile(self, profile: Dict) -> str:
         """Format student profile for readability"""
-        lines = []
-        for key, value in profile.items():
-            if isinstance(value, list):
-                lines.append(f"- {key.replace('_', ' ').title()}: {', '.join(map(str, value))}")
-            else:
-                lines.append(f"- {key.replace('_', ' ').title()}: {value}")
-        return "\n".join(lines)
+        return _format_profile_items(_freeze_profile(profile))
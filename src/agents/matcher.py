@@ -1,19 +1,100 @@
-from crewai import Agent, Task
-from typing import Dict, List
-import json
+from crewai import Task
+from functools import lru_cache
+from typing import Dict, List, Optional
+import asyncio
 import logging
+import re
+
+import numpy as np
+
+from src.database.qv_cache import QVCache
+from src.utils.hashing import prompt_json
+from src.utils.profile import coerce_list
+from src.utils.ranking import numeric_array
+from src.agents.agent_cache import cached_agent
+
+
+# Query variants used to diversify candidates across Reach/Target/Safety
+QUERY_VARIANT_SUFFIXES = [
+    ("", 20),
+    ("strong research output and faculty", 10),
+    ("affordable tuition with scholarships", 10),
+    ("accessible admissions and good employment outcomes", 10),
+]
+
+# Candidates fetched for the base query before the relaxation filters are applied
+MATCH_CANDIDATE_LIMIT = 100
+
+# Final matcher results are reused for near-identical profiles for up to an hour
+MATCH_CACHE_SIZE = 256
+MATCH_CACHE_SIMILARITY = 0.95
+MATCH_CACHE_TTL_SECONDS = 60 * 60
+
+# Interest terms (3+ chars) and career-goal keywords (5+ chars), extracted in one regex pass each
+INTEREST_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z\-]{2,}")
+CAREER_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z\-]{4,}")
+
+# Payload fields sent to the LLM for each search result in the matching task
+MATCHING_PROMPT_FIELDS = (
+    'univ_name', 'program', 'country', 'tuition_usd', 'acceptance_rate',
+    'similarity_score', 'research_output', 'employment_rate_6mo'
+)
+
+# Matching task description - filled with the formatted vector search results
+MATCHING_TMPL = """
+Based on vector search results, analyze and rank these {num_results} universities
+for the student profile.
+
+Consider:
+1. Semantic similarity score
+2. Acceptance rate vs student qualifications
+3. Research alignment
+4. Budget fit
+5. Career prospects
+
+Provide top 10 recommendations categorized as:
+- Reach (3 universities)
+- Target (4 universities)
+- Safety (3 universities)
+
+For each, explain WHY it's a good fit.
+
+Search Results:
+{results}
+"""
+
+
+def build_query(program: str, interests, career_goals: str) -> str:
+    """Build the semantic search query: program, top 5 interest terms, top 3 career keywords"""
+    # Interests may be a list or a comma/space separated string
+    return _build_query(program, " ".join(coerce_list(interests)), career_goals)
+
+
+@lru_cache(maxsize=1024)
+def _build_query(program: str, interests: str, career_goals: str) -> str:
+    interest_terms = INTEREST_TOKEN_RE.findall(interests)[:5]
+    career_terms = CAREER_TOKEN_RE.findall(career_goals)[:3] if isinstance(career_goals, str) else []
+    
+    query = " ".join(filter(None, [program, *interest_terms, *career_terms]))
+    return query or "university programs"
 
 
 class MatcherAgent:
     def __init__(self, llm, vector_db):
         self.vector_db = vector_db
-        self.agent = Agent(
+        self.match_cache = QVCache(
+            maxsize=MATCH_CACHE_SIZE,
+            similarity_threshold=MATCH_CACHE_SIMILARITY,
+            ttl=MATCH_CACHE_TTL_SECONDS
+        )
+        self.agent = cached_agent(
+            'MatcherAgent',
+            llm,
             role="University Matching Specialist",
             goal="Find the best-fit universities based on student profile and preferences using semantic search",
             backstory="""You are a data-driven matching expert who uses advanced vector search 
             to find universities that truly align with student goals, not just superficial criteria. 
             You understand that fit goes beyond rankings.""",
-            llm=llm,
             verbose=True,
             allow_delegation=False
         )
@@ -25,31 +106,7 @@ class MatcherAgent:
         interests = student_profile.get('interests', [])
         career_goals = student_profile.get('career_goals', '')
         
-        # Handle interests - could be list or string
-        if isinstance(interests, str):
-            # Handle comma-separated or space-separated
-            if ',' in interests:
-                interests_list = [i.strip() for i in interests.split(',') if i.strip()]
-            else:
-                # Split by spaces if no commas
-                interests_list = [i.strip() for i in interests.split() if i.strip() and len(i.strip()) > 2]
-        elif isinstance(interests, list):
-            interests_list = [str(i).strip() for i in interests if i]
-        else:
-            interests_list = []
-        
-        # Build comprehensive query string
-        query_parts = []
-        if program:
-            query_parts.append(program)
-        if interests_list:
-            query_parts.extend(interests_list[:5])  # Limit to top 5 interests
-        if career_goals:
-            # Extract key terms from career goals
-            career_keywords = [word for word in career_goals.split() if len(word) > 4]
-            query_parts.extend(career_keywords[:3])  # Add top 3 keywords
-        
-        query = ' '.join(query_parts) if query_parts else program or "university programs"
+        query = build_query(program, interests, career_goals)
         
         # Build filters - matches article
         target_countries = student_profile.get("target_countries", [])
@@ -81,31 +138,133 @@ class MatcherAgent:
             {}
         ]
         
-        # Try each search attempt until we get results
+        # Keyed on the base query and the strictest filter set; the relaxation
+        # outcome below is deterministic for a given (query, filters) pair
+        cache_filters = {k: v for k, v in search_attempts[0].items() if v is not None and v != []}
+        try:
+            query_vector = self.vector_db.embed(query)
+            cached = self.match_cache.get(query_vector, cache_filters, 0)
+        except Exception as e:
+            logging.warning(f"Matcher cache lookup failed: {e}")
+            query_vector, cached = None, None
+        if cached is not None:
+            logging.info(f"Matcher cache hit: {len(cached)} results for query='{query}'")
+            return cached
+        
+        results = self._search_with_relaxation(query, search_attempts)
+        if results and query_vector is not None:
+            self.match_cache.put(query_vector, cache_filters, 0, results)
+        return results
+
+    def _search_with_relaxation(self, query: str, search_attempts: List[Dict]) -> List[Dict]:
+        """Fetch candidates once, then relax the filters in Python
+        
+        A single over-fetched batch search replaces one ANN round-trip per attempt;
+        the attempts are applied to the candidates in order and the strictest one
+        that yields results wins. Every attempt but the last requires a country or
+        level match, so Qdrant applies that OR server-side; the final unfiltered
+        search covers the last attempt.
+        """
+        queries = [f"{query} {suffix}".strip() for suffix, _ in QUERY_VARIANT_SUFFIXES]
+        limits = [limit for _, limit in QUERY_VARIANT_SUFFIXES]
+        result_limit = sum(limits)
+        # Over-fetch for the base query so post-filtering still has enough to choose from
+        limits[0] = max(limits[0], MATCH_CANDIDATE_LIMIT)
+        any_of = {k: v for k, v in search_attempts[0].items() if k in ("countries", "level") and v}
+        candidate_filters = {"any_of": any_of} if any_of else None
+        
+        logging.info(f"Matcher candidate search: query='{query}', limits={limits}, filters={candidate_filters}")
+        batches, fallback = asyncio.run(
+            self._afetch_candidates(queries, limits, candidate_filters, result_limit)
+        )
+        if isinstance(batches, Exception):
+            logging.warning(f"Matcher candidate search failed: {batches}")
+            batches = []
+        candidates = self._merge_results(batches)
+        
+        arrays = self._filter_arrays(candidates)
         for attempt_num, filters in enumerate(search_attempts, 1):
             # Clean up None values
             clean_filters = {k: v for k, v in filters.items() if v is not None and v != []}
-            
-            try:
-                logging.info(f"Matcher attempt {attempt_num}: query='{query}', filters={clean_filters}")
-                results = self.vector_db.search_universities(query, clean_filters if clean_filters else None, limit=20)
-                if results and len(results) > 0:
-                    logging.info(f"Matcher found {len(results)} results with attempt {attempt_num}")
-                    return results
-                else:
-                    logging.info(f"Matcher attempt {attempt_num} returned 0 results")
-            except Exception as e:
-                logging.warning(f"Matcher search attempt {attempt_num} failed: {e}")
-                continue
+            results = [candidates[i] for i in np.flatnonzero(self._apply_filters(arrays, clean_filters))]
+            if results:
+                logging.info(f"Matcher found {len(results)} results with attempt {attempt_num}, filters={clean_filters}")
+                return results[:result_limit]
+            logging.info(f"Matcher attempt {attempt_num} returned 0 results")
         
-        # If all attempts failed, try a very basic search
-        try:
-            logging.info("Trying basic search without any filters")
-            results = self.vector_db.search_universities(program or "university", None, limit=20)
-            return results if results else []
-        except Exception as e:
-            logging.error(f"Matcher final search error: {e}")
+        # Nothing matched any country or level; fall back to semantic search only
+        if isinstance(fallback, Exception):
+            logging.error(f"Matcher final search error: {fallback}")
             return []
+        logging.info("Using basic search without any filters")
+        return fallback or []
+
+    async def _afetch_candidates(self, queries: List[str], limits: List[int],
+                                 candidate_filters: Optional[Dict], fallback_limit: int):
+        """Run the candidate search and the unfiltered fallback search concurrently
+        
+        The fallback is only needed when no candidate matches, but dispatching it
+        up front costs one extra search instead of a second sequential round-trip.
+        
+        Returns:
+            (candidate batches, fallback results); either may be the raised exception
+        """
+        candidate_search = asyncio.to_thread(
+            self.vector_db.search_universities_batch, queries, candidate_filters, limits=limits
+        )
+        if candidate_filters is None:
+            # The candidate search is already unfiltered
+            (batches,) = await asyncio.gather(candidate_search, return_exceptions=True)
+            return batches, []
+        fallback_search = asyncio.to_thread(
+            self.vector_db.search_universities, queries[0], None, limit=fallback_limit
+        )
+        batches, fallback = await asyncio.gather(candidate_search, fallback_search, return_exceptions=True)
+        return batches, fallback
+
+    @staticmethod
+    def _filter_arrays(candidates: List[Dict]) -> Dict[str, np.ndarray]:
+        """Struct-of-arrays view of the fields the relaxation tiers filter on"""
+        return {
+            'country': np.array([u.get('country') for u in candidates], dtype=object),
+            'level': np.array([u.get('level') for u in candidates], dtype=object),
+            # Unparsable tuition becomes NaN, which never passes a budget cap
+            'tuition_usd': numeric_array(candidates, 'tuition_usd', np.nan)
+        }
+
+    @staticmethod
+    def _apply_filters(arrays: Dict[str, np.ndarray], filters: Dict) -> np.ndarray:
+        """Boolean mask of candidates passing the same rules as UniversityVectorDB._build_filter"""
+        mask = np.ones(len(arrays['country']), dtype=bool)
+        
+        countries = filters.get("countries")
+        if countries:
+            mask &= np.isin(arrays['country'], [c.strip() for c in countries])
+        
+        level = filters.get("level")
+        if isinstance(level, str) and level:
+            mask &= arrays['level'] == level.lower().strip()
+        
+        min_tuition = filters.get("min_tuition")
+        if isinstance(min_tuition, (int, float)) and min_tuition > 0:
+            mask &= arrays['tuition_usd'] >= int(min_tuition)
+        
+        max_tuition = filters.get("max_tuition")
+        if isinstance(max_tuition, (int, float)) and max_tuition > 0:
+            # Same 20% buffer for scholarships as the Qdrant range filter
+            mask &= arrays['tuition_usd'] <= int(max_tuition * 1.2)
+        return mask
+
+    def _merge_results(self, batches: List[List[Dict]]) -> List[Dict]:
+        """Merge result lists from the query variants, deduplicating by univ_id"""
+        merged = {}
+        for results in batches:
+            for uni in results:
+                key = uni.get('univ_id') or (uni.get('univ_name'), uni.get('program'), uni.get('level'))
+                existing = merged.get(key)
+                if existing is None or uni.get('similarity_score', 0) > existing.get('similarity_score', 0):
+                    merged[key] = uni
+        return sorted(merged.values(), key=lambda u: u.get('similarity_score', 0), reverse=True)
 
     def create_matching_task(self, student_profile: Dict, enriched_data: Dict) -> Task:
         """Create task to match student with universities"""
@@ -137,42 +296,17 @@ class MatcherAgent:
         )
 
         return Task(
-            description=f"""
-Based on vector search results, analyze and rank these {len(results)} universities
-for the student profile.
-
-Consider:
-1. Semantic similarity score
-2. Acceptance rate vs student qualifications
-3. Research alignment
-4. Budget fit
-5. Career prospects
-
-Provide top 10 recommendations categorized as:
-- Reach (3 universities)
-- Target (4 universities)
-- Safety (3 universities)
-
-For each, explain WHY it's a good fit.
-
-Search Results:
-{self._format_results(results)}
-""",
+            description=MATCHING_TMPL.format(
+                num_results=len(results),
+                results=self._format_results(results)
+            ),
             agent=self.agent,
             expected_output="Categorized list of universities with fit explanations"
         )
 
     def _format_results(self, results: List[Dict]) -> str:
-        """Format search results for the agent"""
-        formatted = []
-        for i, uni in enumerate(results, 1):
-            formatted.append(f"""
-{i}. {uni['univ_name']} - {uni['program']}
-Country: {uni['country']}
-Tuition: ${uni['tuition_usd']:,}
-Acceptance Rate: {uni.get('acceptance_rate', 0) * 100:.1f}%
-Similarity Score: {uni.get('similarity_score', 0):.3f}
-Research: {uni.get('research_output', 'N/A')}
-Employment Rate: {uni.get('employment_rate_6mo', 0) * 100:.1f}%
-""")
-        return "\n".join(formatted)
+        """Format search results for the agent as a JSON array of the fields it ranks on"""
+        return prompt_json([
+            {field: uni.get(field) for field in MATCHING_PROMPT_FIELDS}
+            for uni in results
+        ])
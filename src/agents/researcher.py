@@ -1,6 +1,15 @@
-from crewai import Agent, Task
+from crewai import Task
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Dict
 import json
+import logging
+import os
+import re
+
+from src.agents.agent_cache import cached_agent
+
+logger = logging.getLogger(__name__)
 
 
 # Researcher Agent Template - matches article structure
@@ -13,46 +22,138 @@ Provide JSON for each country:
 - Average cost of living
 """
 
+# Per-country enrichment prompt, one LLM call per target country
+COUNTRY_TMPL = """
+Student from {origin} applying for {level} programs in {country}.
+Reply with a single JSON object with these keys:
+- "visa": visa type
+- "processing_time": typical visa processing time
+- "financial_proof": financial proof required
+- "language": accepted language tests and minimum scores
+- "timeline": application timeline
+- "cost_of_living": average monthly cost of living in USD
+"""
+
+# Curated visa/language/cost details for the app's target countries, relative to the project root;
+# countries listed here skip the enrichment LLM call
+COUNTRY_FACTS_PATH = os.path.join('data', 'reference', 'country_facts.json')
+
+# Upper bound on concurrent per-country LLM calls
+MAX_ENRICHMENT_WORKERS = 8
+
+# First {...} block in an LLM reply that may wrap the JSON in prose or code fences
+JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+@lru_cache(maxsize=1)
+def load_country_facts() -> Dict[str, Dict]:
+    """Load the static country facts table once; empty if the file is missing or invalid"""
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        with open(os.path.join(project_root, COUNTRY_FACTS_PATH), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Country facts unavailable, every country will be researched: {e}")
+        return {}
+
+
+@lru_cache(maxsize=256)
+def _country_prompt(origin: str, level: str, country: str) -> str:
+    """Fill COUNTRY_TMPL; students sharing origin, level and country reuse the prompt"""
+    return COUNTRY_TMPL.format(origin=origin, level=level, country=country)
+
+
+def _parse_json_reply(reply: str) -> Dict:
+    """Extract the JSON object from an LLM reply; non-JSON replies are kept as a summary"""
+    match = JSON_OBJECT_RE.search(reply or "")
+    return json.loads(match.group(0)) if match else {"summary": reply}
+
 
 class ResearcherAgent:
     def __init__(self, llm):
-        self.agent = Agent(
+        self.llm = llm
+        self.agent = cached_agent(
+            'ResearcherAgent',
+            llm,
             role="University Research Specialist",
             goal="Gather and enrich university data with visa requirements, language prerequisites, and regional considerations",
             backstory="""You are an expert in international education with deep knowledge of 
             visa requirements, language tests, and regional higher education systems. You help 
             students understand country-specific requirements and prepare documentation.""",
-            llm=llm,
             verbose=True,
             allow_delegation=False
         )
 
+    def _enrichment_description(self, student_profile: Dict) -> str:
+        """Fill RESEARCHER_TMPL from the profile"""
+        return RESEARCHER_TMPL.format(
+            origin=student_profile.get('origin_country', 'Not specified'),
+            level=student_profile.get('level', 'Not specified'),
+            countries=', '.join(student_profile.get('target_countries', []))
+        )
+
     def create_enrichment_task(self, student_profile: Dict) -> Task:
         """Create task to enrich student profile with contextual requirements - matches article"""
-        origin = student_profile.get('origin_country', 'Not specified')
-        level = student_profile.get('level', 'Not specified')
-        countries = ', '.join(student_profile.get('target_countries', []))
-        
-        # Use article's template structure
-        description = RESEARCHER_TMPL.format(
-            origin=origin,
-            level=level,
-            countries=countries
-        )
-        
         return Task(
-            description=description,
+            description=self._enrichment_description(student_profile),
             agent=self.agent,
             expected_output="JSON with enriched country and visa information"
         )
+
+    def enrich_direct(self, student_profile: Dict) -> Dict:
+        """
+        Single-shot enrichment without CrewAI Task/Crew scheduling
+        
+        Sends the enrichment prompt straight to the LLM and parses the JSON reply.
+        
+        Args:
+            student_profile: Student profile with origin_country, level and target_countries
+            
+        Returns:
+            Parsed JSON reply ({'summary': reply} if it holds no JSON object), or {} on failure
+        """
+        try:
+            reply = self.llm.call([{"role": "user", "content": self._enrichment_description(student_profile)}])
+            return _parse_json_reply(reply)
+        except Exception as e:
+            logger.warning(f"Direct enrichment failed: {e}")
+            return {}
     
     def run_researcher(self, student_profile: Dict) -> Dict:
-        """Run researcher agent and return enriched data - matches article"""
-        task = self.create_enrichment_task(student_profile)
-        # In actual implementation, this would execute the task via CrewAI
-        # For now, return a structured response
+        """Run researcher agent and return enriched data - matches article
+        
+        Countries in the static facts table are answered from it. Each remaining
+        country is enriched by its own LLM call; the calls are I/O-bound, so they
+        run concurrently on a thread pool.
+        """
+        origin = student_profile.get('origin_country', 'Not specified')
+        level = student_profile.get('level', 'Not specified')
+        countries = student_profile.get('target_countries', [])
+        
+        facts = load_country_facts()
+        requirements = {country: dict(facts[country]) for country in countries if country in facts}
+        unknown = [country for country in countries if country not in facts]
+        if unknown:
+            with ThreadPoolExecutor(max_workers=min(MAX_ENRICHMENT_WORKERS, len(unknown)),
+                                    thread_name_prefix="researcher") as pool:
+                requirements.update(zip(
+                    unknown,
+                    pool.map(lambda country: self._enrich_country(country, origin, level), unknown)
+                ))
+        
         return {
-            "origin": student_profile.get('origin_country', 'Not specified'),
-            "level": student_profile.get('level', 'Not specified'),
-            "countries": student_profile.get('target_countries', [])
+            "origin": origin,
+            "level": level,
+            "countries": countries,
+            "requirements": requirements
         }
+
+    def _enrich_country(self, country: str, origin: str, level: str) -> Dict:
+        """Ask the LLM for one country's visa, language and cost details; empty on failure"""
+        prompt = _country_prompt(str(origin), str(level), str(country))
+        try:
+            reply = self.llm.call([{"role": "user", "content": prompt}])
+            return _parse_json_reply(reply)
+        except Exception as e:
+            logger.warning(f"Enrichment for {country} failed: {e}")
+            return {}
@@ -3,57 +3,105 @@ Verifier Agent - Validates critical information in recommendations
 Checks deadlines, scholarship claims, and data accuracy
 """
 
-from crewai import Agent, Task
+from crewai import Task
+from functools import lru_cache
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-import pandas as pd
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import numpy as np
+import pickle
 import re
+import threading
 
 from src.utils.groq_llm import create_groq_llm
+from src.utils.hashing import stable_hash
+from src.utils.ranking import float_array, numeric_array
+from src.agents.agent_cache import cached_agent
+from src.database.semantic_cache import SemanticLLMCache
 
 
-class VerifierAgent:
-    """
-    Agent responsible for verifying critical information in recommendations.
-    Ensures data accuracy, flags outdated information, and provides confidence scores.
-    """
-    
-    def __init__(self, llm):
-        self.agent = Agent(
-            role="Information Verification Specialist",
-            goal="Verify critical information like deadlines, scholarship availability, and admission requirements with high accuracy",
-            backstory="""You are a meticulous fact-checker with 10 years of experience in 
-            international education. You have an eye for detail and never let inaccurate 
-            information slip through. You understand that students make life-changing 
-            decisions based on this data, so accuracy is paramount. You flag uncertain 
-            information and suggest verification methods.""",
-            llm=llm,
-            verbose=True,
-            allow_delegation=False
-        )
-        
-        # Confidence thresholds
-        self.confidence_thresholds = {
-            'high': 0.85,
-            'medium': 0.60,
-            'low': 0.40
-        }
-    
-    def create_verification_task(self, recommendations: List[Dict], student_profile: Dict) -> Task:
-        """
-        Create task to verify critical information in recommendations
-        
-        Args:
-            recommendations: List of university recommendations
-            student_profile: Student's profile for context
-            
-        Returns:
-            Task object for CrewAI to execute
-        """
-        verification_items = self._prepare_verification_items(recommendations)
-        
-        return Task(
-            description=f"""
+# Realistic cost ranges by country and level (annual tuition in USD)
+TUITION_RANGES = {
+    'USA': {
+        'bachelors': (20000, 70000),
+        'masters': (25000, 65000),
+        'phd': (0, 40000)  # Often funded
+    },
+    'UK': {
+        'bachelors': (15000, 40000),
+        'masters': (15000, 45000),
+        'phd': (15000, 35000)
+    },
+    'Canada': {
+        'bachelors': (12000, 35000),
+        'masters': (12000, 40000),
+        'phd': (5000, 25000)
+    },
+    'Germany': {
+        'bachelors': (0, 5000),
+        'masters': (0, 5000),
+        'phd': (0, 3000)
+    },
+    'Australia': {
+        'bachelors': (20000, 45000),
+        'masters': (22000, 50000),
+        'phd': (18000, 42000)
+    },
+    'Netherlands': {
+        'bachelors': (6000, 15000),
+        'masters': (8000, 20000),
+        'phd': (0, 5000)
+    },
+    'Sweden': {
+        'bachelors': (0, 18000),
+        'masters': (0, 20000),
+        'phd': (0, 0)  # Usually free
+    }
+}
+
+# Living cost ranges by country (monthly in USD)
+LIVING_RANGES = {
+    'USA': (1200, 3000),
+    'UK': (1000, 2500),
+    'Canada': (900, 2000),
+    'Germany': (800, 1500),
+    'Australia': (1200, 2500),
+    'Netherlands': (900, 1800),
+    'Sweden': (900, 1600)
+}
+
+# Index tables for vectorized cost checks: (country, level) -> (min, max) tuition, country -> (min, max) living
+LEVELS = ('bachelors', 'masters', 'phd')
+COUNTRY_INDEX = {country: i for i, country in enumerate(TUITION_RANGES)}
+LEVEL_INDEX = {level: i for i, level in enumerate(LEVELS)}
+TUITION_RANGE_TABLE = np.array(
+    [[TUITION_RANGES[country][level] for level in LEVELS] for country in COUNTRY_INDEX],
+    dtype=np.float64
+)
+LIVING_RANGE_TABLE = np.array([LIVING_RANGES[country] for country in COUNTRY_INDEX], dtype=np.float64)
+
+# Scholarship eligibility rules: keywords matched in one scan per scholarship name
+SCHOLARSHIP_KEYWORD_RE = re.compile(r'commonwealth|merit|need')
+SCHOLARSHIP_SPLIT_RE = re.compile(r'\s*,\s*')
+COMMONWEALTH_COUNTRIES = ('india', 'pakistan', 'bangladesh', 'nigeria',
+                          'ghana', 'kenya', 'uganda', 'jamaica')
+COMMONWEALTH_COUNTRY_SET = frozenset(COMMONWEALTH_COUNTRIES)
+
+# Output contract for verification, shared by the CrewAI task and the direct LLM path
+VERIFICATION_OUTPUT_FORMAT = """JSON object with verification results for each university:
+            {
+                "university_id": {
+                    "confidence_score": 85,
+                    "flags": ["deadline_tight", "scholarship_unverified"],
+                    "verification_needed": ["Check official website for current deadlines"],
+                    "risk_level": "MEDIUM",
+                    "details": {...}
+                }
+            }"""
+
+# Verification prompt: the static instructions are kept apart so only the
+# per-request tail is formatted
+VERIFICATION_PROMPT_HEADER = """
             Verify the following critical information from university recommendations:
             
             **Your Task:**
@@ -82,14 +130,16 @@ class VerifierAgent:
                - Does the program still accept international students?
                - Is the program currently active (not discontinued)?
             
-            **Verification Items:**
-            {verification_items}
+"""
+
+VERIFICATION_TMPL = """            **Verification Items:**
+            {items}
             
             **Student Context:**
-            - Origin: {student_profile.get('origin_country', 'Not specified')}
-            - Budget: ${student_profile.get('budget', 'Not specified')}
-            - Level: {student_profile.get('level', 'Not specified')}
-            - Timeline: Applying in {datetime.now().strftime('%Y')}
+            - Origin: {origin}
+            - Budget: ${budget}
+            - Level: {level}
+            - Timeline: Applying in {year}
             
             **Output Format:**
             For each university, provide:
@@ -99,37 +149,279 @@ class VerifierAgent:
             - Risk level: LOW / MEDIUM / HIGH
             
             Be thorough but practical. Flag genuine concerns, not minor uncertainties.
-            """,
+            """
+
+VERIFICATION_ITEM_TMPL = """
+            {idx}. {name} - {program}
+               - Deadline: {deadline}
+               - Tuition: ${tuition:,.0f}
+               - Living Cost: ${living:,.0f}/month
+               - Scholarships: {scholarships}
+               - Acceptance Rate: {acceptance:.1f}%
+               - Language: {language}
+            """
+
+# Recommendations whose rule-based checks reach this confidence with no
+# actionable flags skip the LLM review
+LLM_REVIEW_CONFIDENCE = 0.9
+
+# Flags that describe the data without calling for a second look
+INFORMATIONAL_FLAGS = frozenset({'no_scholarships_mentioned'})
+
+# Advice per flag category, in the order it is listed; cost and scholarship
+# checks emit free-text flags, so they are reported under one tag each
+FLAG_ADVICE = (
+    ('deadline_passed', " This university's deadline has passed. Remove from list."),
+    ('deadline_urgent', " Deadline is very soon. Prioritize this application or consider skipping."),
+    ('deadline_approaching', " Start application process immediately."),
+    ('cost_flagged', " Verify costs on official university website."),
+    ('scholarship_flagged', " Check scholarship eligibility criteria carefully."),
+)
+ALL_CLEAR_ADVICE = " All checks passed. Proceed with application."
+
+# Verification reports memoized per distinct (profile, recommendations, day)
+REPORT_CACHE_SIZE = 64
+
+# The only fields generate_verification_report reads, and so the only ones in its cache key
+REPORT_PROFILE_FIELDS = ('origin_country', 'gpa', 'budget')
+REPORT_RECOMMENDATION_FIELDS = (
+    'univ_id', 'univ_name', 'program', 'deadline', 'tuition_usd',
+    'living_cost_monthly', 'country', 'level', 'scholarship_tags'
+)
+
+
+def _university_id(rec: Dict) -> str:
+    """Key a recommendation is reported under"""
+    return rec.get('univ_id', rec.get('univ_name', 'unknown'))
+
+
+def _unique_recommendations(recommendations: List[Dict]) -> List[Dict]:
+    """One recommendation per university, in first-seen order, keeping the last duplicate's data"""
+    unique = {}
+    for rec in recommendations:
+        unique[_university_id(rec)] = rec
+    return list(unique.values())
+
+
+@lru_cache(maxsize=512)
+def _deadline_check(deadline_str: str, today_ordinal: int) -> Dict:
+    """Deadline verification keyed on the day, so repeated deadlines are parsed once per day"""
+    try:
+        days_remaining = date.fromisoformat(deadline_str).toordinal() - today_ordinal
+        
+        # Check if deadline has passed
+        if days_remaining < 0:
+            return {
+                'valid': False,
+                'confidence': 0.0,
+                'flag': 'deadline_passed',
+                'message': f'Deadline has passed by {abs(days_remaining)} days',
+                'risk_level': 'HIGH'
+            }
+        
+        # Check if deadline is too soon
+        elif days_remaining < 30:
+            return {
+                'valid': True,
+                'confidence': 0.5,
+                'flag': 'deadline_urgent',
+                'message': f'Only {days_remaining} days remaining - very tight timeline',
+                'risk_level': 'MEDIUM'
+            }
+        
+        # Check if deadline is reasonable
+        elif days_remaining < 90:
+            return {
+                'valid': True,
+                'confidence': 0.8,
+                'flag': 'deadline_approaching',
+                'message': f'{days_remaining} days remaining - adequate time with focus',
+                'risk_level': 'LOW'
+            }
+        
+        else:
+            return {
+                'valid': True,
+                'confidence': 1.0,
+                'flag': None,
+                'message': f'{days_remaining} days remaining - comfortable timeline',
+                'risk_level': 'LOW'
+            }
+            
+    except Exception as e:
+        return {
+            'valid': False,
+            'confidence': 0.0,
+            'flag': 'deadline_invalid',
+            'message': f'Could not parse deadline: {str(e)}',
+            'risk_level': 'HIGH'
+        }
+
+
+class VerifierAgent:
+    """
+    Agent responsible for verifying critical information in recommendations.
+    Ensures data accuracy, flags outdated information, and provides confidence scores.
+    """
+    
+    def __init__(self, llm, vector_db=None):
+        self.llm = llm
+        # Near-duplicate verification requests reuse earlier LLM replies when a vector DB is available
+        self.semantic_cache = SemanticLLMCache(vector_db, namespace="verification") if vector_db is not None else None
+        self.agent = cached_agent(
+            'VerifierAgent',
+            llm,
+            role="Information Verification Specialist",
+            goal="Verify critical information like deadlines, scholarship availability, and admission requirements with high accuracy",
+            backstory="""You are a meticulous fact-checker with 10 years of experience in 
+            international education. You have an eye for detail and never let inaccurate 
+            information slip through. You understand that students make life-changing 
+            decisions based on this data, so accuracy is paramount. You flag uncertain 
+            information and suggest verification methods.""",
+            verbose=True,
+            allow_delegation=False
+        )
+        
+        # Pickled reports by input hash; unpickling hands each caller its own copy
+        self._report_cache = OrderedDict()
+        self._report_cache_lock = threading.Lock()
+        
+        # Confidence thresholds
+        self.confidence_thresholds = {
+            'high': 0.85,
+            'medium': 0.60,
+            'low': 0.40
+        }
+    
+    def create_verification_task(self, recommendations: List[Dict], student_profile: Dict) -> Task:
+        """
+        Create task to verify critical information in recommendations
+        
+        Args:
+            recommendations: List of university recommendations
+            student_profile: Student's profile for context
+            
+        Returns:
+            Task object for CrewAI to execute
+        """
+        return Task(
+            description=self._verification_description(recommendations, student_profile),
             agent=self.agent,
-            expected_output="""JSON object with verification results for each university:
-            {
-                "university_id": {
-                    "confidence_score": 85,
-                    "flags": ["deadline_tight", "scholarship_unverified"],
-                    "verification_needed": ["Check official website for current deadlines"],
-                    "risk_level": "MEDIUM",
-                    "details": {...}
-                }
-            }"""
+            expected_output=VERIFICATION_OUTPUT_FORMAT
+        )
+    
+    def verify_with_llm(self, recommendations: List[Dict], student_profile: Dict) -> str:
+        """
+        Run the verification prompt directly against the LLM
+        
+        Repeated prompts are answered from the LLM's response cache when it has one,
+        whatever the LLM's temperature; with a vector DB, near-duplicate program
+        lists for the same student context reuse an earlier reply.
+        
+        Args:
+            recommendations: List of university recommendations
+            student_profile: Student's profile for context
+            
+        Returns:
+            Raw LLM reply (expected to be VERIFICATION_OUTPUT_FORMAT JSON)
+        """
+        recommendations = _unique_recommendations(recommendations)
+        cache_text = self._semantic_cache_text(recommendations)
+        cache_scope = self._semantic_cache_scope(recommendations, student_profile)
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.get(cache_text, cache_scope)
+            if cached is not None:
+                return cached
+        
+        prompt = self._verification_description(recommendations, student_profile)
+        # Verification is a review, not creative sampling, so its replies are cached at any temperature
+        reply = self.llm.call([{
+            "role": "user",
+            "content": f"{prompt}\nReply with a {VERIFICATION_OUTPUT_FORMAT}"
+        }], cacheable=True)
+        if self.semantic_cache is not None and reply:
+            self.semantic_cache.put(cache_text, reply, cache_scope)
+        return reply
+    
+    def verify_recommendations(self, recommendations: List[Dict], student_profile: Dict) -> Dict:
+        """
+        Rule-based verification report, with an LLM review of only the doubtful recommendations
+        
+        Recommendations that pass every rule check with high confidence are not
+        sent to the LLM; when all of them pass, no LLM call is made.
+        
+        Args:
+            recommendations: List of university recommendations
+            student_profile: Student's profile for context
+            
+        Returns:
+            generate_verification_report output plus 'llm_reviewed' (university
+            ids sent to the LLM) and 'llm_review' (raw LLM reply, or None)
+        """
+        report = self.generate_verification_report(recommendations, student_profile)
+        
+        needs_review = []
+        reviewed_ids = []
+        for rec in _unique_recommendations(recommendations):
+            uni_id = _university_id(rec)
+            verification = report['verifications'][uni_id]
+            actionable_flags = [f for f in verification['flags'] if f not in INFORMATIONAL_FLAGS]
+            if verification['overall_confidence'] < LLM_REVIEW_CONFIDENCE or actionable_flags:
+                needs_review.append(rec)
+                reviewed_ids.append(uni_id)
+        
+        report['llm_reviewed'] = reviewed_ids
+        report['llm_review'] = self.verify_with_llm(needs_review, student_profile) if needs_review else None
+        return report
+    
+    def _semantic_cache_text(self, recommendations: List[Dict]) -> str:
+        """The programs under review, embedded as the semantic cache key"""
+        return "; ".join(
+            f"{rec.get('univ_name', 'Unknown')} {rec.get('program', '')}"
+            for rec in recommendations
+        )
+    
+    def _semantic_cache_scope(self, recommendations: List[Dict], student_profile: Dict) -> Dict:
+        """Prompt inputs a cached reply must match exactly: student context, year and deadlines"""
+        return {
+            'origin': student_profile.get('origin_country', ''),
+            'level': student_profile.get('level', ''),
+            'budget': student_profile.get('budget', ''),
+            'year': datetime.now().strftime('%Y'),
+            'deadlines': stable_hash([rec.get('deadline', '') for rec in recommendations])
+        }
+    
+    def _verification_description(self, recommendations: List[Dict], student_profile: Dict) -> str:
+        """Build the verification prompt for a set of recommendations"""
+        return VERIFICATION_PROMPT_HEADER + VERIFICATION_TMPL.format(
+            items=self._prepare_verification_items(_unique_recommendations(recommendations)),
+            origin=student_profile.get('origin_country', 'Not specified'),
+            budget=student_profile.get('budget', 'Not specified'),
+            level=student_profile.get('level', 'Not specified'),
+            year=datetime.now().strftime('%Y')
         )
     
     def _prepare_verification_items(self, recommendations: List[Dict]) -> str:
         """Format recommendations for verification prompt"""
-        items = []
-        
-        for idx, rec in enumerate(recommendations, 1):
-            item = f"""
-            {idx}. {rec.get('univ_name', 'Unknown')} - {rec.get('program', 'Unknown')}
-               - Deadline: {rec.get('deadline', 'Not specified')}
-               - Tuition: ${rec.get('tuition_usd', 0):,}
-               - Living Cost: ${rec.get('living_cost_monthly', 0):,}/month
-               - Scholarships: {rec.get('scholarship_tags', 'none')}
-               - Acceptance Rate: {rec.get('acceptance_rate', 0) * 100:.1f}%
-               - Language: {rec.get('language', 'Not specified')}
-            """
-            items.append(item)
-        
-        return "\n".join(items)
+        # Payload numbers may arrive as strings; unparsable values show as 0
+        tuition = numeric_array(recommendations, 'tuition_usd', 0.0)
+        living = numeric_array(recommendations, 'living_cost_monthly', 0.0)
+        acceptance_pct = numeric_array(recommendations, 'acceptance_rate', 0.0) * 100
+        
+        return "\n".join(
+            VERIFICATION_ITEM_TMPL.format(
+                idx=idx,
+                name=rec.get('univ_name', 'Unknown'),
+                program=rec.get('program', 'Unknown'),
+                deadline=rec.get('deadline', 'Not specified'),
+                tuition=tuition[idx - 1],
+                living=living[idx - 1],
+                scholarships=rec.get('scholarship_tags', 'none'),
+                acceptance=acceptance_pct[idx - 1],
+                language=rec.get('language', 'Not specified')
+            )
+            for idx, rec in enumerate(recommendations, 1)
+        )
     
     def verify_deadlines(self, matches: List[Dict]) -> List[Dict]:
         """Verify deadlines - matches article structure"""
@@ -152,68 +444,19 @@ class VerifierAgent:
         
         return issues
 
-    def verify_deadline(self, deadline_str: str) -> Dict:
+    def verify_deadline(self, deadline_str: str, today: Optional[date] = None) -> Dict:
         """
         Verify if a deadline is valid and provides adequate time
         
         Args:
             deadline_str: Deadline in string format (YYYY-MM-DD)
+            today: Reference date, defaults to the current date
             
         Returns:
             Dictionary with verification results
         """
-        try:
-            deadline = pd.to_datetime(deadline_str)
-            today = pd.Timestamp.now()
-            days_remaining = (deadline - today).days
-            
-            # Check if deadline has passed
-            if days_remaining < 0:
-                return {
-                    'valid': False,
-                    'confidence': 0.0,
-                    'flag': 'deadline_passed',
-                    'message': f'Deadline has passed by {abs(days_remaining)} days',
-                    'risk_level': 'HIGH'
-                }
-            
-            # Check if deadline is too soon
-            elif days_remaining < 30:
-                return {
-                    'valid': True,
-                    'confidence': 0.5,
-                    'flag': 'deadline_urgent',
-                    'message': f'Only {days_remaining} days remaining - very tight timeline',
-                    'risk_level': 'MEDIUM'
-                }
-            
-            # Check if deadline is reasonable
-            elif days_remaining < 90:
-                return {
-                    'valid': True,
-                    'confidence': 0.8,
-                    'flag': 'deadline_approaching',
-                    'message': f'{days_remaining} days remaining - adequate time with focus',
-                    'risk_level': 'LOW'
-                }
-            
-            else:
-                return {
-                    'valid': True,
-                    'confidence': 1.0,
-                    'flag': None,
-                    'message': f'{days_remaining} days remaining - comfortable timeline',
-                    'risk_level': 'LOW'
-                }
-                
-        except Exception as e:
-            return {
-                'valid': False,
-                'confidence': 0.0,
-                'flag': 'deadline_invalid',
-                'message': f'Could not parse deadline: {str(e)}',
-                'risk_level': 'HIGH'
-            }
+        today = today or date.today()
+        return dict(_deadline_check(deadline_str, today.toordinal()))
     
     def verify_cost_accuracy(self, tuition: int, living_cost: int, 
                             country: str, level: str) -> Dict:
@@ -229,90 +472,54 @@ class VerifierAgent:
         Returns:
             Dictionary with verification results
         """
-        # Realistic cost ranges by country (annual tuition in USD)
-        cost_ranges = {
-            'USA': {
-                'bachelors': (20000, 70000),
-                'masters': (25000, 65000),
-                'phd': (0, 40000)  # Often funded
-            },
-            'UK': {
-                'bachelors': (15000, 40000),
-                'masters': (15000, 45000),
-                'phd': (15000, 35000)
-            },
-            'Canada': {
-                'bachelors': (12000, 35000),
-                'masters': (12000, 40000),
-                'phd': (5000, 25000)
-            },
-            'Germany': {
-                'bachelors': (0, 5000),
-                'masters': (0, 5000),
-                'phd': (0, 3000)
-            },
-            'Australia': {
-                'bachelors': (20000, 45000),
-                'masters': (22000, 50000),
-                'phd': (18000, 42000)
-            },
-            'Netherlands': {
-                'bachelors': (6000, 15000),
-                'masters': (8000, 20000),
-                'phd': (0, 5000)
-            },
-            'Sweden': {
-                'bachelors': (0, 18000),
-                'masters': (0, 20000),
-                'phd': (0, 0)  # Usually free
-            }
-        }
-        
-        # Living cost ranges by country (monthly in USD)
-        living_ranges = {
-            'USA': (1200, 3000),
-            'UK': (1000, 2500),
-            'Canada': (900, 2000),
-            'Germany': (800, 1500),
-            'Australia': (1200, 2500),
-            'Netherlands': (900, 1800),
-            'Sweden': (900, 1600)
-        }
-        
-        issues = []
-        confidence = 1.0
-        
-        # Verify tuition
-        if country in cost_ranges and level in cost_ranges[country]:
-            min_tuition, max_tuition = cost_ranges[country][level]
-            
-            if tuition < min_tuition * 0.5:
-                issues.append(f"Tuition (${tuition:,}) seems unusually low for {country}")
-                confidence -= 0.3
-            elif tuition > max_tuition * 1.5:
-                issues.append(f"Tuition (${tuition:,}) seems unusually high for {country}")
-                confidence -= 0.2
-        
-        # Verify living costs
-        if country in living_ranges:
-            min_living, max_living = living_ranges[country]
+        return self._cost_checks([tuition], [living_cost], [country], [level])[0]
+    
+    def _cost_checks(self, tuitions: List, living_costs: List,
+                     countries: List[str], levels: List[str]) -> List[Dict]:
+        """Vectorized verify_cost_accuracy over parallel lists of recommendation fields"""
+        n = len(countries)
+        # Unparsable costs become NaN and are never flagged
+        tuition = float_array(tuitions, np.nan)
+        living = float_array(living_costs, np.nan)
+        country_ids = np.fromiter((COUNTRY_INDEX.get(c, -1) for c in countries), dtype=np.intp, count=n)
+        level_ids = np.fromiter((LEVEL_INDEX.get(l, -1) for l in levels), dtype=np.intp, count=n)
+        
+        known_country = country_ids >= 0
+        known_level = known_country & (level_ids >= 0)
+        tuition_range = TUITION_RANGE_TABLE[np.maximum(country_ids, 0), np.maximum(level_ids, 0)]
+        living_range = LIVING_RANGE_TABLE[np.maximum(country_ids, 0)]
+        
+        tuition_low = known_level & (tuition < tuition_range[:, 0] * 0.5)
+        tuition_high = known_level & ~tuition_low & (tuition > tuition_range[:, 1] * 1.5)
+        living_low = known_country & (living < living_range[:, 0] * 0.5)
+        living_high = known_country & ~living_low & (living > living_range[:, 1] * 1.5)
+        
+        confidence = np.maximum(
+            0.0, 1.0 - 0.3 * tuition_low - 0.2 * tuition_high - 0.2 * living_low - 0.2 * living_high
+        )
+        valid = ~(tuition_low | tuition_high | living_low | living_high)
+        risk_levels = np.where(confidence < 0.5, 'HIGH', np.where(confidence < 0.8, 'MEDIUM', 'LOW'))
+        
+        results = []
+        for i in range(n):
+            issues = []
+            if tuition_low[i]:
+                issues.append(f"Tuition (${tuition[i]:,.0f}) seems unusually low for {countries[i]}")
+            elif tuition_high[i]:
+                issues.append(f"Tuition (${tuition[i]:,.0f}) seems unusually high for {countries[i]}")
+            if living_low[i]:
+                issues.append(f"Living cost (${living[i]:.0f}/mo) seems too low for {countries[i]}")
+            elif living_high[i]:
+                issues.append(f"Living cost (${living[i]:.0f}/mo) seems too high for {countries[i]}")
             
-            if living_cost < min_living * 0.5:
-                issues.append(f"Living cost (${living_cost}/mo) seems too low for {country}")
-                confidence -= 0.2
-            elif living_cost > max_living * 1.5:
-                issues.append(f"Living cost (${living_cost}/mo) seems too high for {country}")
-                confidence -= 0.2
-        
-        confidence = max(0.0, confidence)
-        
-        return {
-            'valid': len(issues) == 0,
-            'confidence': confidence,
-            'flags': issues,
-            'message': '; '.join(issues) if issues else 'Costs appear reasonable',
-            'risk_level': 'HIGH' if confidence < 0.5 else 'MEDIUM' if confidence < 0.8 else 'LOW'
-        }
+            results.append({
+                'valid': bool(valid[i]),
+                'confidence': float(confidence[i]),
+                'flags': issues,
+                'message': '; '.join(issues) if issues else 'Costs appear reasonable',
+                'risk_level': str(risk_levels[i])
+            })
+        return results
     
     def verify_scholarship_eligibility(self, scholarship_tags: str, 
                                       student_profile: Dict) -> Dict:
@@ -326,6 +533,20 @@ class VerifierAgent:
         Returns:
             Dictionary with eligibility verification
         """
+        return self._scholarship_checks([scholarship_tags], student_profile)[0]
+    
+    def _scholarship_checks(self, scholarship_tags_list: List[str], student_profile: Dict) -> List[Dict]:
+        """verify_scholarship_eligibility over many tag strings, reading the profile once"""
+        origin_country = student_profile.get('origin_country', '').lower()
+        gpa = student_profile.get('gpa', 0)
+        budget = student_profile.get('budget', 0)
+        return [
+            self._scholarship_check(tags, origin_country, gpa, budget)
+            for tags in scholarship_tags_list
+        ]
+    
+    def _scholarship_check(self, scholarship_tags: str, origin_country: str,
+                           gpa: float, budget: float) -> Dict:
         if not scholarship_tags or scholarship_tags == 'none':
             return {
                 'valid': True,
@@ -335,34 +556,29 @@ class VerifierAgent:
                 'risk_level': 'LOW'
             }
         
-        scholarships = [s.strip() for s in scholarship_tags.split(',')]
+        scholarships = SCHOLARSHIP_SPLIT_RE.split(scholarship_tags.strip().lower())
         eligibility_checks = []
         
-        origin_country = student_profile.get('origin_country', '').lower()
-        gpa = student_profile.get('gpa', 0)
-        
         for scholarship in scholarships:
-            scholarship_lower = scholarship.lower()
+            keywords = set(SCHOLARSHIP_KEYWORD_RE.findall(scholarship))
             
             # Commonwealth scholarships
-            if 'commonwealth' in scholarship_lower:
-                commonwealth_countries = ['india', 'pakistan', 'bangladesh', 'nigeria', 
-                                         'ghana', 'kenya', 'uganda', 'jamaica']
-                if origin_country not in commonwealth_countries:
+            if 'commonwealth' in keywords:
+                if origin_country not in COMMONWEALTH_COUNTRY_SET:
                     eligibility_checks.append(
-                        f"Commonwealth scholarship typically for {', '.join(commonwealth_countries)}"
+                        f"Commonwealth scholarship typically for {', '.join(COMMONWEALTH_COUNTRIES)}"
                     )
             
             # Merit-based scholarships
-            if 'merit' in scholarship_lower:
+            if 'merit' in keywords:
                 if gpa < 3.5:
                     eligibility_checks.append(
                         "Merit scholarships typically require GPA > 3.5"
                     )
             
             # Need-based scholarships
-            if 'need' in scholarship_lower:
-                if student_profile.get('budget', 0) > 40000:
+            if 'need' in keywords:
+                if budget > 40000:
                     eligibility_checks.append(
                         "Need-based scholarships typically for lower budgets"
                     )
@@ -391,6 +607,35 @@ class VerifierAgent:
         Returns:
             Complete verification report
         """
+        today = date.today()
+        cache_key = stable_hash([
+            today.toordinal(),
+            [student_profile.get(field) for field in REPORT_PROFILE_FIELDS],
+            [[rec.get(field) for field in REPORT_RECOMMENDATION_FIELDS] for rec in recommendations]
+        ])
+        with self._report_cache_lock:
+            cached = self._report_cache.get(cache_key)
+            if cached is not None:
+                self._report_cache.move_to_end(cache_key)
+        if cached is not None:
+            report = pickle.loads(cached)
+            # The checks are valid for the day; the timestamp reflects this request
+            report['timestamp'] = datetime.now().isoformat()
+            return report
+        
+        report = self._build_verification_report(recommendations, student_profile, today)
+        
+        with self._report_cache_lock:
+            self._report_cache[cache_key] = pickle.dumps(report)
+            while len(self._report_cache) > REPORT_CACHE_SIZE:
+                self._report_cache.popitem(last=False)
+        return report
+    
+    def _build_verification_report(self, recommendations: List[Dict],
+                                   student_profile: Dict, today: date) -> Dict:
+        # Duplicate rows for a university are verified once
+        recommendations = _unique_recommendations(recommendations)
+        
         report = {
             'timestamp': datetime.now().isoformat(),
             'total_universities': len(recommendations),
@@ -403,21 +648,22 @@ class VerifierAgent:
             }
         }
         
-        for rec in recommendations:
-            uni_id = rec.get('univ_id', rec.get('univ_name', 'unknown'))
-            
-            # Verify different aspects
-            deadline_check = self.verify_deadline(rec.get('deadline', ''))
-            cost_check = self.verify_cost_accuracy(
-                rec.get('tuition_usd', 0),
-                rec.get('living_cost_monthly', 0),
-                rec.get('country', ''),
-                rec.get('level', '')
-            )
-            scholarship_check = self.verify_scholarship_eligibility(
-                rec.get('scholarship_tags', ''),
-                student_profile
-            )
+        # Run each kind of check over all recommendations, then combine per university
+        deadline_checks = [self.verify_deadline(rec.get('deadline', ''), today) for rec in recommendations]
+        cost_checks = self._cost_checks(
+            [rec.get('tuition_usd', 0) for rec in recommendations],
+            [rec.get('living_cost_monthly', 0) for rec in recommendations],
+            [rec.get('country', '') for rec in recommendations],
+            [rec.get('level', '') for rec in recommendations]
+        )
+        scholarship_checks = self._scholarship_checks(
+            [rec.get('scholarship_tags', '') for rec in recommendations],
+            student_profile
+        )
+        
+        for rec, deadline_check, cost_check, scholarship_check in zip(
+                recommendations, deadline_checks, cost_checks, scholarship_checks):
+            uni_id = _university_id(rec)
             
             # Calculate overall confidence
             overall_confidence = (
@@ -433,6 +679,12 @@ class VerifierAgent:
             all_flags.extend(cost_check.get('flags', []))
             all_flags.extend(scholarship_check.get('flags', []))
             
+            advice_tags = {deadline_check.get('flag')}
+            if cost_check.get('flags'):
+                advice_tags.add('cost_flagged')
+            if scholarship_check.get('flags'):
+                advice_tags.add('scholarship_flagged')
+            
             # Determine overall risk
             risk_levels = [
                 deadline_check['risk_level'],
@@ -453,7 +705,7 @@ class VerifierAgent:
                     'scholarships': scholarship_check
                 },
                 'flags': all_flags,
-                'recommendations': self._generate_recommendations(all_flags, rec)
+                'recommendations': self._generate_recommendations(advice_tags, rec)
             }
             
             report['verifications'][uni_id] = verification
@@ -472,46 +724,29 @@ class VerifierAgent:
         
         return report
     
-    def _generate_recommendations(self, flags: List[str], university: Dict) -> List[str]:
-        """Generate actionable recommendations based on flags"""
-        recommendations = []
-        
-        if 'deadline_passed' in flags:
-            recommendations.append(" This university's deadline has passed. Remove from list.")
-        
-        if 'deadline_urgent' in flags:
-            recommendations.append(" Deadline is very soon. Prioritize this application or consider skipping.")
-        
-        if 'deadline_approaching' in flags:
-            recommendations.append(" Start application process immediately.")
-        
-        if any('cost' in f.lower() for f in flags):
-            recommendations.append(" Verify costs on official university website.")
-        
-        if any('scholarship' in f.lower() for f in flags):
-            recommendations.append(" Check scholarship eligibility criteria carefully.")
-        
-        if not recommendations:
-            recommendations.append(" All checks passed. Proceed with application.")
-        
-        return recommendations
+    def _generate_recommendations(self, advice_tags: set, university: Dict) -> List[str]:
+        """Generate actionable recommendations from the flag categories raised for a university"""
+        recommendations = [advice for tag, advice in FLAG_ADVICE if tag in advice_tags]
+        return recommendations or [ALL_CLEAR_ADVICE]
 
 
 # Utility function for standalone verification
-def quick_verify(university: Dict, student_profile: Dict) -> Dict:
+def quick_verify(university: Dict, student_profile: Dict, llm=None) -> Dict:
     """
     Quick verification function for single university
     
     Args:
         university: University data dictionary
         student_profile: Student profile dictionary
+        llm: LLM for the agent (optional, defaults to the shared Groq client)
         
     Returns:
         Verification results
     """
-    # Create a dummy LLM config (won't be used for quick checks)
-    dummy_llm = create_groq_llm(model='llama-3.1-8b-instant', temperature=0.7)
-    verifier = VerifierAgent(llm=dummy_llm)
+    # The LLM is only needed to build the agent; the rule-based checks never call it
+    if llm is None:
+        llm = create_groq_llm(model='llama-3.1-8b-instant', temperature=0.7)
+    verifier = VerifierAgent(llm=llm)
     
     return verifier.generate_verification_report([university], student_profile)
 
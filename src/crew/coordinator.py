@@ -3,9 +3,10 @@ from src.agents.researcher import ResearcherAgent
 from src.agents.matcher import MatcherAgent
 from src.agents.counselor import CounselorAgent
 from src.agents.verifier import VerifierAgent
-from typing import Dict
+from typing import Dict, Iterator, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
 import os
-import pandas as pd
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -13,6 +14,14 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+PLAN_ERROR_MESSAGE = "Error generating plan. Please try again."
+
+# Profiles processed concurrently by run_batch
+BATCH_CONCURRENCY = 4
+
+# Seconds to wait on an enrichment stage (research, deadline checks) before skipping it
+AGENT_TIMEOUT_SECONDS = 60
+
 
 class UniversityRecommendationPipeline:
     """University Recommendation Pipeline - matches article structure"""
@@ -26,88 +35,175 @@ class UniversityRecommendationPipeline:
         self.researcher = ResearcherAgent(llm)
         self.matcher = MatcherAgent(llm, db)
         self.counselor = CounselorAgent(llm)
-        self.verifier = VerifierAgent(llm)
+        self.verifier = VerifierAgent(llm, db)
 
-    def run(self, student_profile: Dict) -> Dict:
-        """Run the complete recommendation pipeline - matches article structure"""
+    def iter_run(self, student_profile: Dict) -> Iterator[Dict]:
+        """Run the pipeline stage by stage, yielding each stage's output as soon as it is ready
+        
+        Research only enriches the result, so it runs alongside everything else
+        and is collected last; the plan, the deadline checks and the
+        verification report only depend on the matches, so they run
+        concurrently as soon as matching finishes. Research and verification
+        are enrichments: if they fail or time out the pipeline continues with
+        empty results instead of failing.
+        """
+        pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="agent")
         try:
-            # Step 1: Research enrichment
-            research = self.researcher.run_researcher(student_profile)
+            # Research enrichment alongside Qdrant matching
+            research_future = pool.submit(self.researcher.run_researcher, student_profile)
+            # The matcher builds its query from the profile alone, so it doesn't wait on research
+            matches_future = pool.submit(self.matcher.run_matcher, student_profile, {})
             
-            # Step 2: Match universities using Qdrant
-            matches = self.matcher.run_matcher(student_profile, research)
+            # Step 1: Match universities using Qdrant
+            matches = matches_future.result() or []
+            yield {"stage": "matches", "data": matches}
             
-            # Step 3: Create application plan
+            # Step 2: Create application plan while deadlines and data are verified
+            issues_future = pool.submit(self.verifier.verify_deadlines, matches) if matches else None
+            # Only doubtful matches are sent to the LLM for a second look
+            verification_future = (
+                pool.submit(self.verifier.verify_recommendations, matches, student_profile) if matches else None
+            )
             plan = self.counselor.create_plan(matches, student_profile)
+            yield {"stage": "plan", "data": plan}
             
-            # Step 4: Verify deadlines
-            issues = self.verifier.verify_deadlines(matches) if matches else []
+            # Step 3: Verify deadlines, then collect the verification report
+            issues = self._optional_result(issues_future, "Verifier", []) if issues_future else []
+            yield {"stage": "issues", "data": issues}
             
-            return {
-                "profile": student_profile,
-                "research": research,
-                "matches": matches if matches else [],
-                "plan": plan,
-                "issues": issues
-            }
+            verification = (
+                self._optional_result(verification_future, "Verifier", {}) if verification_future else {}
+            )
+            yield {"stage": "verification", "data": verification}
+            
+            # Step 4: Country requirements, usually finished by now
+            research = self._optional_result(research_future, "Researcher", {})
+            yield {"stage": "research", "data": research}
+        finally:
+            # Don't block on a stage that already timed out
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _optional_result(self, future: Future, agent_name: str, default):
+        """Result of an enrichment stage, or the default if it fails or exceeds its timeout"""
+        try:
+            return future.result(timeout=AGENT_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"{agent_name} stage skipped: {e!r}")
+            return default
+
+    def assemble(self, student_profile: Dict, stages: Dict) -> Dict:
+        """Combine stage outputs into the pipeline result; missing stages fall back to empty values"""
+        return {
+            "profile": student_profile,
+            "research": stages.get("research", {}),
+            "matches": stages.get("matches") or [],
+            "plan": stages.get("plan", PLAN_ERROR_MESSAGE),
+            "issues": stages.get("issues", []),
+            "verification": stages.get("verification", {})
+        }
+
+    def run(self, student_profile: Dict) -> Dict:
+        """Run the complete recommendation pipeline - matches article structure"""
+        try:
+            stages = {chunk["stage"]: chunk["data"] for chunk in self.iter_run(student_profile)}
         except Exception as e:
             logger.error(f"Pipeline error: {e}")
             # Return empty result on error
-            return {
-                "profile": student_profile,
-                "research": {},
-                "matches": [],
-                "plan": "Error generating plan. Please try again.",
-                "issues": []
-            }
+            stages = {}
+        return self.assemble(student_profile, stages)
+
+    def run_batch(self, student_profiles: List[Dict]) -> List[Dict]:
+        """Run the pipeline for several profiles concurrently
+        
+        Each profile still gets its own run(); the search and embedding caches
+        (and the LLM response cache, for deterministic models) are shared, so
+        similar profiles in a batch reuse work.
+        
+        Returns:
+            One pipeline result per profile, in input order
+        """
+        if not student_profiles:
+            return []
+        workers = min(BATCH_CONCURRENCY, len(student_profiles))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            return list(pool.map(self.run, student_profiles))
 
 
 class UniversityRecommendationCrew:
     """CrewAI-based recommendation system - maintains compatibility"""
     
     def __init__(self, vector_db):
-        """Initialize the crew with all agents"""
-        
-        # Get LLM configuration for Groq
+        """Initialize the crew; the LLM, pipeline and agents are built on first use"""
+        self.vector_db = vector_db
+
+    @cached_property
+    def groq_llm(self):
+        """Groq LLM shared by all agents"""
         from src.utils.groq_llm import create_groq_llm
         
-        # Initialize Groq LLM
-        self.groq_llm = create_groq_llm(
+        return create_groq_llm(
             model='llama-3.1-8b-instant',  # or 'llama-3.3-70b-versatile' for better performance
             temperature=0.7
         )
 
-        # Initialize agents with Groq LLM
-        self.researcher = ResearcherAgent(self.groq_llm)
-        self.matcher = MatcherAgent(self.groq_llm, vector_db)
-        self.counselor = CounselorAgent(self.groq_llm)
-        self.verifier = VerifierAgent(self.groq_llm)
+    @cached_property
+    def pipeline(self) -> UniversityRecommendationPipeline:
+        return UniversityRecommendationPipeline(self.vector_db, self.groq_llm)
 
-        self.vector_db = vector_db
-        
-        # Also create pipeline instance
-        self.pipeline = UniversityRecommendationPipeline(vector_db, self.groq_llm)
+    # Agents are the pipeline's own, so the crew never builds a second set
+    @property
+    def researcher(self) -> ResearcherAgent:
+        return self.pipeline.researcher
 
-    def run_recommendation_process(self, student_profile: Dict) -> Dict:
-        """Run the complete recommendation process"""
+    @property
+    def matcher(self) -> MatcherAgent:
+        return self.pipeline.matcher
+
+    @property
+    def counselor(self) -> CounselorAgent:
+        return self.pipeline.counselor
+
+    @property
+    def verifier(self) -> VerifierAgent:
+        return self.pipeline.verifier
+
+    def iter_recommendation_process(self, student_profile: Dict) -> Iterator[Dict]:
+        """Yield each pipeline stage as it completes, then a final 'done' chunk with the full result"""
         
         print("\n" + "="*60)
         print("🎓 UNIVERSITY RECOMMENDATION SYSTEM")
         print("="*60 + "\n")
         
-        # Use pipeline approach - matches article
-        result = self.pipeline.run(student_profile)
+        stages = {}
+        try:
+            for chunk in self.pipeline.iter_run(student_profile):
+                stages[chunk["stage"]] = chunk["data"]
+                yield chunk
+        except Exception as e:
+            logger.error(f"Pipeline error: {e}")
+            # Drop partial output so an error result looks the same as pipeline.run()'s
+            stages = {}
+        result = self.pipeline.assemble(student_profile, stages)
         
         print("\n" + "="*60)
         print("✅ RECOMMENDATIONS COMPLETE")
         print("="*60 + "\n")
         
-        return {
-            'recommendations': result,
-            'profile': student_profile,
-            'timestamp': datetime.now().isoformat()
+        yield {
+            "stage": "done",
+            "data": {
+                'recommendations': result,
+                'profile': student_profile,
+                'timestamp': datetime.now().isoformat()
+            }
         }
 
+    def run_recommendation_process(self, student_profile: Dict) -> Dict:
+        """Run the complete recommendation process"""
+        for chunk in self.iter_recommendation_process(student_profile):
+            if chunk["stage"] == "done":
+                return chunk["data"]
+
 
 if __name__ == "__main__":
     from src.database.qdrant_client import UniversityVectorDB
@@ -4,7 +4,11 @@ Handles Qdrant vector database operations and data loading
 """
 
 from .qdrant_client import UniversityVectorDB
+from .qv_cache import QVCache
+from .semantic_cache import SemanticLLMCache
 
 __all__ = [
-    'UniversityVectorDB'
+    'UniversityVectorDB',
+    'QVCache',
+    'SemanticLLMCache'
 ]
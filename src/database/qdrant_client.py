@@ -1,19 +1,224 @@
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
-    Filter, FieldCondition, Range, MatchValue, MatchAny
+    Filter, FieldCondition, Range, MatchValue, MatchAny, QueryRequest,
+    OptimizersConfigDiff, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    SearchParams, QuantizationSearchParams, PayloadSchemaType
 )
 from sentence_transformers import SentenceTransformer
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+import hashlib
+import json
 import os
+import sys
+import asyncio
 import logging
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 
+from src.database.qv_cache import QVCache
+from src.utils.ranking import numeric_array
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Sentence-transformer used for programs and queries; its embeddings are
+# L2-normalized, so dot product equals cosine similarity
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Encoder runtime: 'torch' (default), or 'onnx' / 'openvino' when optimum is installed.
+# EMBEDDING_MODEL_FILE picks an exported variant, e.g. 'onnx/model_qint8_avx2.onnx' for
+# the dynamically int8-quantized model
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_MODEL_FILE = os.getenv('EMBEDDING_MODEL_FILE')
+
+# Encoder device ('cuda', 'mps', 'cpu'); unset lets sentence-transformers pick the best available
+EMBEDDING_DEVICE = os.getenv('EMBEDDING_DEVICE') or None
+
+# Optional token cap below the model's 256; shorter sequences cut attention cost but
+# truncate long descriptions, so regenerate precomputed embeddings after changing it
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv('EMBEDDING_MAX_SEQ_LENGTH', 0)) or None
+
+# Program embeddings precomputed by generate_sample_data.py, relative to the project root
+EMBEDDINGS_PATH = os.path.join('data', 'processed', 'embeddings', 'universities.npy')
+
+# Sidecar recording the CSV and encoder settings the precomputed embeddings came from
+EMBEDDINGS_META_PATH = os.path.splitext(EMBEDDINGS_PATH)[0] + '.json'
+
+# Number of query embeddings kept in memory (float32 arrays, ~1.5 KB each)
+EMBEDDING_CACHE_SIZE = 1024
+
+# Search results are reused for at most this long, so a reload from another
+# process (init_system.py, fix_qdrant_collection.py) shows up without a restart
+SEARCH_CACHE_TTL_SECONDS = 60 * 60
+
+# Bulk ingest: points per upsert request and upsert requests in flight
+UPSERT_BATCH_SIZE = 256
+UPSERT_CONCURRENCY = 4
+
+# Program texts per encoder forward pass when embedding at load time
+EMBED_BATCH_SIZE = 64
+
+# Bytes of CSV per streamed ingest chunk; bounds the rows, vectors and points held at once
+CSV_BLOCK_SIZE = 1 << 20
+
+# Column types pinned for the streamed CSV read, which otherwise infers every column
+# from the first chunk; deadlines stay ISO strings rather than dates
+CSV_COLUMN_TYPES = {
+    'deadline': pa.string(),
+    'scholarship_tags': pa.string(),
+    'acceptance_rate': pa.float64(),
+    'qs_ranking': pa.float64(),
+    'employment_rate_6mo': pa.float64(),
+}
+
+# Columns summed into the total_cost_annual payload field (tuition plus 12 months of living)
+COST_COLUMNS = ('tuition_usd', 'living_cost_monthly')
+
+# Low-cardinality payload fields whose string values are interned in search results
+INTERNED_PAYLOAD_FIELDS = ('country', 'level', 'language', 'research_output',
+                           'scholarship_tags', 'visa_difficulty')
+
+# Indexing threshold (KB) restored after a bulk load; 0 disables HNSW building while loading
+INDEXING_THRESHOLD = 20000
+
+# Search over the int8 vectors, then rescore twice the requested candidates with the originals
+SEARCH_PARAMS = SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=2.0))
+
+# HNSW graph degree restored after a bulk load; m=0 skips graph links while loading
+HNSW_M = 16
+
+# Payload indexes for the fields FILTER_BUILDERS filters on, so filtered searches
+# look candidates up instead of scanning payloads
+PAYLOAD_INDEXES = (
+    ("country", PayloadSchemaType.KEYWORD),
+    ("level", PayloadSchemaType.KEYWORD),
+    ("tuition_usd", PayloadSchemaType.INTEGER),
+)
+
+# In-process search: with LOCAL_SEARCH=1 a catalog of up to LOCAL_SEARCH_MAX_POINTS programs
+# is held in RAM and scored with one matrix-vector product instead of a Qdrant round-trip
+LOCAL_SEARCH = os.getenv('LOCAL_SEARCH', '').lower() in ('1', 'true', 'yes')
+LOCAL_SEARCH_MAX_POINTS = 50000
+
+
+def load_encoder() -> SentenceTransformer:
+    """
+    Load the sentence-transformer on EMBEDDING_BACKEND, falling back to PyTorch.
+
+    The ONNX/OpenVINO backends need optimum and a sentence-transformers release
+    with backend support; if either is missing the PyTorch model is used.
+    """
+    encoder = None
+    if EMBEDDING_BACKEND != 'torch':
+        model_kwargs = {'file_name': EMBEDDING_MODEL_FILE} if EMBEDDING_MODEL_FILE else None
+        try:
+            encoder = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE,
+                                          backend=EMBEDDING_BACKEND, model_kwargs=model_kwargs)
+        except Exception as e:
+            logger.warning(f"Could not load {EMBEDDING_BACKEND} encoder, using PyTorch: {e}")
+    if encoder is None:
+        encoder = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE)
+    if EMBEDDING_MAX_SEQ_LENGTH:
+        encoder.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    logger.info(f"Loaded {EMBEDDING_MODEL} encoder on {encoder.device}")
+    return encoder
+
+
+def encoder_settings(encoder: SentenceTransformer) -> Dict:
+    """Settings that change the vectors an encoder produces, as actually loaded"""
+    # load_encoder may have fallen back to PyTorch, so ask the encoder rather than the environment
+    backend = getattr(encoder, 'backend', 'torch')
+    return {
+        'model': EMBEDDING_MODEL,
+        'backend': backend,
+        'model_file': EMBEDDING_MODEL_FILE if backend != 'torch' else None,
+        'max_seq_length': encoder.max_seq_length
+    }
+
+
+def csv_fingerprint(csv_path: str) -> Dict:
+    """Size and SHA-256 of a CSV file"""
+    digest = hashlib.sha256()
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(CSV_BLOCK_SIZE), b''):
+            digest.update(block)
+    return {'size': os.path.getsize(csv_path), 'sha256': digest.hexdigest()}
+
+
+def embeddings_metadata(csv_path: str, encoder: SentenceTransformer) -> Dict:
+    """Sidecar contents for embeddings of csv_path produced by encoder"""
+    return {'csv': csv_fingerprint(csv_path), 'encoder': encoder_settings(encoder)}
+
+
+def save_embeddings_metadata(path: str, csv_path: str, encoder: SentenceTransformer):
+    """Write the sidecar for embeddings of csv_path produced by encoder"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(embeddings_metadata(csv_path, encoder), f, indent=2)
+
+
+def payload_values(column: pd.Series) -> List:
+    """
+    Convert a DataFrame column to JSON-native payload values.
+
+    Numeric and boolean columns keep their Python int/float/bool values so
+    Qdrant range filters apply to them; everything else (strings, dates) is
+    stored as a string. Missing cells become None.
+    """
+    dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        values = column.tolist()
+    else:
+        values = column.astype(str).tolist()
+    return [None if missing else value for value, missing in zip(values, column.isna().to_numpy())]
+
+
+def _country_condition(countries) -> Optional[FieldCondition]:
+    if not isinstance(countries, list) or not countries:
+        return None
+    # Normalize country names (handle variations)
+    normalized_countries = [c.strip() for c in countries]
+    logger.info(f"Applied country filter: {normalized_countries}")
+    return FieldCondition(key="country", match=MatchAny(any=normalized_countries))
+
+
+def _positive_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def _tuition_condition(min_tuition, max_tuition) -> Optional[FieldCondition]:
+    # Both bounds go into one Range so Qdrant probes the tuition index once; ints match the stored values
+    lower = int(min_tuition) if _positive_number(min_tuition) else None
+    # Add 20% buffer to account for scholarships and variations
+    upper = int(max_tuition * 1.2) if _positive_number(max_tuition) else None
+    if lower is None and upper is None:
+        return None
+    logger.info(f"Applied tuition filter: ${lower or 0} - ${upper or 'any'} (original max: ${max_tuition})")
+    return FieldCondition(key="tuition_usd", range=Range(gte=lower, lte=upper))
+
+
+def _level_condition(level) -> Optional[FieldCondition]:
+    if not isinstance(level, str):
+        return None
+    # Make level matching case-insensitive by normalizing
+    level_normalized = level.lower().strip()
+    logger.info(f"Applied level filter: {level_normalized}")
+    return FieldCondition(key="level", match=MatchValue(value=level_normalized))
+
+
+# Filter key (or tuple of keys, passed positionally) -> condition builder;
+# falsy values and keys without a builder are ignored
+FILTER_BUILDERS = {
+    "countries": _country_condition,
+    ("min_tuition", "max_tuition"): _tuition_condition,
+    "level": _level_condition,
+}
+
 
 class UniversityVectorDB:
     def __init__(self):
@@ -23,21 +228,41 @@ class UniversityVectorDB:
         Raises:
             ConnectionError: If unable to connect to Qdrant server
         """
+        self.host = os.getenv('QDRANT_HOST', 'localhost')
+        self.port = int(os.getenv('QDRANT_PORT', 6333))
+        self.grpc_port = int(os.getenv('QDRANT_GRPC_PORT', 6334))
+
         try:
             self.client = QdrantClient(
-                host=os.getenv('QDRANT_HOST', 'localhost'),
-                port=int(os.getenv('QDRANT_PORT', 6333)),
+                host=self.host,
+                port=self.port,
                 timeout=10  # Add timeout for connection
             )
         except Exception as e:
             logger.error(f"Failed to connect to Qdrant: {e}")
-            raise ConnectionError(f"Could not connect to Qdrant at {os.getenv('QDRANT_HOST', 'localhost')}:{os.getenv('QDRANT_PORT', 6333)}. Make sure Qdrant is running.")
+            raise ConnectionError(f"Could not connect to Qdrant at {self.host}:{self.port}. Make sure Qdrant is running.")
 
         # Use a good sentence transformer model
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+        self.encoder = load_encoder()
         self.vector_size = 384  # Dimension for all-MiniLM-L6-v2
 
+        # LRU cache of query embeddings; shared across Streamlit sessions, hence the lock
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+
+        # Client-side cache of search results for repeated/near-identical queries
+        self.qv_cache = QVCache(ttl=SEARCH_CACHE_TTL_SECONDS)
+
         self.collection_name = "universities"
+        # Set once the collection is known to exist, so searches skip the existence round-trip
+        self._collection_verified = False
+
+        # (N, 384) float32 program vectors and their payloads for search_local
+        self._local_vectors: Optional[np.ndarray] = None
+        self._local_payloads: List[Dict] = []
+        self._local_columns: Dict[str, np.ndarray] = {}
+        self._local_too_large = False
+        self._local_lock = threading.RLock()
     
     def verify_collection(self) -> bool:
         """Verify collection exists and has correct configuration"""
@@ -70,24 +295,120 @@ class UniversityVectorDB:
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.vector_size,
-                    distance=Distance.COSINE
+                    # Vectors are unit length, so dot product ranks like cosine without the norms
+                    distance=Distance.DOT,
+                    # Originals are only read to rescore candidates, so they can live on disk
+                    on_disk=True
+                ),
+                # Build the HNSW graph once after the bulk load instead of on every upsert
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+                hnsw_config=HnswConfigDiff(m=0),
+                # int8 copies of the vectors kept in RAM for search; originals are used for rescoring
+                quantization_config=ScalarQuantization(
+                    scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
                 )
             )
+            for field_name, field_schema in PAYLOAD_INDEXES:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+            self.qv_cache.clear()
             print(f"✅ Collection '{self.collection_name}' created successfully with vector size {self.vector_size}")
         except Exception as e:
             logger.error(f"Error creating collection: {e}")
             raise e
 
+    def restore_indexing(self):
+        """Re-enable HNSW indexing after a bulk load created with indexing disabled"""
+        try:
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD),
+                hnsw_config=HnswConfigDiff(m=HNSW_M)
+            )
+        except Exception as e:
+            logger.warning(f"Could not restore indexing threshold: {e}")
+
     def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text"""
-        embedding = self.encoder.encode(text)
-        return embedding.tolist()
+        """Generate embedding for text, served from the query embedding cache when repeated"""
+        return self.embed(text)
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed query strings, encoding only cache misses in a single model call"""
+        with self._embedding_lock:
+            missing = [t for t in dict.fromkeys(texts) if t not in self._embedding_cache]
+        
+        if missing:
+            vectors = np.asarray(self.encoder.encode(missing, normalize_embeddings=True), dtype=np.float32)
+            # Cached rows are shared, so freeze them
+            vectors.setflags(write=False)
+            with self._embedding_lock:
+                for text, vector in zip(missing, vectors):
+                    self._embedding_cache[text] = vector
+                while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        
+        embeddings = []
+        with self._embedding_lock:
+            for text in texts:
+                vector = self._embedding_cache.get(text)
+                if vector is None:
+                    # Evicted between encode and lookup; encode directly
+                    vector = self.encoder.encode(text, normalize_embeddings=True)
+                else:
+                    self._embedding_cache.move_to_end(text)
+                embeddings.append(vector.tolist())
+        return embeddings
+
+    def embed(self, text: str) -> List[float]:
+        """Embed a query string, reusing the cached vector for repeated queries"""
+        return self.embed_many([text])[0]
 
     def prepare_search_text(self, row: pd.Series) -> str:
         """Prepare comprehensive search text from university data - matches article structure"""
         # Match article's format: "univ_name | program | description"
         return f"{row['univ_name']} | {row['program']} | {row['description']}"
 
+    @staticmethod
+    def prepare_search_texts(df: pd.DataFrame) -> List[str]:
+        """prepare_search_text for every row at once, using pandas string concatenation"""
+        return (
+            df['univ_name'].astype(str) + ' | ' + df['program'].astype(str) + ' | ' + df['description'].astype(str)
+        ).tolist()
+
+    def _load_cached_embeddings(self, csv_path: str) -> Optional[np.ndarray]:
+        """Memory-map precomputed program embeddings if their sidecar matches this CSV and encoder"""
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        embeddings_path = os.path.join(project_root, EMBEDDINGS_PATH)
+        if not os.path.exists(embeddings_path):
+            return None
+        try:
+            with open(os.path.join(project_root, EMBEDDINGS_META_PATH), encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.info(f"No usable metadata for precomputed embeddings ({e}); re-encoding")
+            return None
+        expected = embeddings_metadata(csv_path, self.encoder)
+        if metadata.get('csv') != expected['csv']:
+            logger.info("Precomputed embeddings were made from a different CSV; re-encoding")
+            return None
+        if metadata.get('encoder') != expected['encoder']:
+            logger.info(f"Precomputed embeddings were made with encoder settings {metadata.get('encoder')}, "
+                        f"not {expected['encoder']}; re-encoding")
+            return None
+        try:
+            vectors = np.load(embeddings_path, mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"Could not read precomputed embeddings: {e}")
+            return None
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+            logger.info(f"Precomputed embeddings shape {vectors.shape} doesn't match the encoder; re-encoding")
+            return None
+        print(f"♻️ Using precomputed embeddings from {EMBEDDINGS_PATH}")
+        return vectors
+
     def load_universities(self, csv_path: str) -> bool:
         """Load universities from CSV and index in Qdrant - matches article structure
         
@@ -110,87 +431,43 @@ class UniversityVectorDB:
                 return False
             
             logger.info(f"Loading data from: {csv_path}")
-            df = pd.read_csv(csv_path)
+            # Stream the CSV so only one chunk of rows, vectors and points is live at once
+            reader = pacsv.open_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+                # Descriptions span lines, so chunk boundaries must respect quoting
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(column_types=CSV_COLUMN_TYPES)
+            )
 
-            if df.empty:
-                logger.error("CSV file is empty")
-                return False
+            # Reuse embeddings saved at generation time for this CSV and encoder
+            cached_vectors = self._load_cached_embeddings(csv_path)
 
-            print(f"📥 Loading {len(df)} university programs...")
-
-            points = []
-            for idx, row in df.iterrows():
-                try:
-                    # Create search text - matches article format
-                    text = f"{row['univ_name']} | {row['program']} | {row['description']}"
-                    
-                    # Generate embedding
-                    vector = self.encoder.encode(text).tolist()
-                    
-                    # Validate vector dimension
-                    if len(vector) != self.vector_size:
-                        logger.error(f"Vector dimension mismatch at index {idx}: expected {self.vector_size}, got {len(vector)}")
-                        continue
-
-                    # Prepare payload - ensure proper data types
-                    payload = {}
-                    for col in df.columns:
-                        value = row[col]
-                        # Convert pandas types to Python native types
-                        if pd.isna(value):
-                            payload[col] = None
-                        elif isinstance(value, (pd.Int64Dtype, pd.Int32Dtype)):
-                            payload[col] = int(value) if not pd.isna(value) else None
-                        elif isinstance(value, (pd.Float64Dtype, pd.Float32Dtype)):
-                            payload[col] = float(value) if not pd.isna(value) else None
-                        elif isinstance(value, pd.Timestamp):
-                            payload[col] = str(value)
-                        else:
-                            payload[col] = str(value) if value is not None else None
-                    
-                    payload['search_text'] = text
-
-                    point = PointStruct(
-                        id=int(idx),  # Ensure ID is int
-                        vector=vector,
-                        payload=payload
-                    )
-                    points.append(point)
+            # Encode and upload chunk by chunk, then let Qdrant build the index
+            try:
+                indexed = asyncio.run(self._aload_chunks(reader, cached_vectors))
+            finally:
+                self.restore_indexing()
 
-                    if (idx + 1) % 50 == 0:
-                        print(f"📦 Processed {idx + 1}/{len(df)} programs")
-                        
-                except Exception as e:
-                    logger.warning(f"Error processing row {idx}: {e}")
-                    continue
+            self.qv_cache.clear()
+            # Pulled again from Qdrant on the next local search
+            with self._local_lock:
+                self._local_vectors = None
+                self._local_too_large = False
 
-            if not points:
-                logger.error("No valid points to index. Check your data file.")
+            if indexed is None:
                 return False
-
-            # Upload to Qdrant in batches to avoid memory issues
-            batch_size = 100
-            total_batches = (len(points) - 1) // batch_size + 1
-            for i in range(0, len(points), batch_size):
-                batch = points[i:i + batch_size]
-                try:
-                    self.client.upsert(
-                        collection_name=self.collection_name,
-                        points=batch
-                    )
-                    print(f"📤 Uploaded batch {i//batch_size + 1}/{total_batches}")
-                except Exception as e:
-                    logger.error(f"Error uploading batch {i//batch_size + 1}: {e}")
-                    return False
-
-            print(f"✅ Successfully indexed {len(points)} programs in Qdrant")
+            if indexed == 0:
+                logger.error("CSV file is empty")
+                return False
+            print(f"✅ Successfully indexed {indexed} programs in Qdrant")
             return True
             
         except FileNotFoundError:
             logger.error(f"CSV file not found: {csv_path}")
             return False
-        except pd.errors.EmptyDataError:
-            logger.error(f"CSV file is empty: {csv_path}")
+        except pa.ArrowInvalid as e:
+            logger.error(f"Could not parse CSV file {csv_path}: {e}")
             return False
         except Exception as e:
             logger.error(f"Error loading universities: {e}")
@@ -198,6 +475,255 @@ class UniversityVectorDB:
             logger.error(traceback.format_exc())
             return False
 
+    async def _aload_chunks(self, reader, cached_vectors: Optional[np.ndarray]) -> Optional[int]:
+        """
+        Encode and upsert each streamed CSV chunk before reading the next.
+
+        Point ids continue across chunks. Returns the number of programs
+        indexed, or None if a chunk failed to upload.
+        """
+        # Ingest goes over HTTP so that setup only needs the REST port
+        client = self.create_async_client(prefer_grpc=False)
+        offset = 0
+        try:
+            for batch in reader:
+                df = batch.to_pandas()
+                if df.empty:
+                    continue
+                print(f"📥 Loading programs {offset + 1}-{offset + len(df)}...")
+
+                if cached_vectors is not None and offset + len(df) > len(cached_vectors):
+                    logger.warning("Precomputed embeddings have fewer rows than the CSV; re-encoding the rest")
+                    cached_vectors = None
+                if cached_vectors is not None:
+                    vectors = cached_vectors[offset:offset + len(df)]
+                else:
+                    # Search text for every program - matches article format
+                    vectors = self.encoder.encode(
+                        self.prepare_search_texts(df), batch_size=EMBED_BATCH_SIZE, show_progress_bar=True,
+                        convert_to_numpy=True, normalize_embeddings=True
+                    )
+
+                # Validate vector dimension
+                if vectors.ndim != 2 or vectors.shape[1] != self.vector_size:
+                    logger.error(f"Vector dimension mismatch: expected {self.vector_size}, got {vectors.shape[1:]}")
+                    return None
+
+                # One contiguous float32 block (a no-op for encoder output and the saved
+                # matrix); per-row .tolist() is then the cheapest way into PointStruct,
+                # which re-validates ndarray vectors element by element
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+                # Prepare payload columns once, typed from each column's dtype
+                payload_columns = {col: payload_values(df[col]) for col in df.columns}
+                # Annual cost doesn't depend on the student, so ranking reads it precomputed
+                if all(col in df and pd.api.types.is_numeric_dtype(df[col]) for col in COST_COLUMNS):
+                    payload_columns['total_cost_annual'] = payload_values(
+                        df['tuition_usd'] + df['living_cost_monthly'] * 12
+                    )
+
+                # Transpose the columns into rows in C rather than indexing every column per point
+                columns = list(payload_columns)
+                rows = zip(*payload_columns.values())
+                points = [
+                    PointStruct(id=offset + idx, vector=vector.tolist(), payload=dict(zip(columns, row)))
+                    for idx, (vector, row) in enumerate(zip(vectors, rows))
+                ]
+
+                # Waiting on the chunk's last batch keeps reading from outrunning Qdrant
+                if not await self.aupsert_points(points, client=client):
+                    return None
+                offset += len(points)
+        finally:
+            await client.close()
+
+        if cached_vectors is not None and len(cached_vectors) != offset:
+            logger.warning(f"Precomputed embeddings have {len(cached_vectors)} rows for {offset} programs; "
+                           f"regenerate them with generate_sample_data.py")
+        return offset
+
+    def _build_filter(self, filters: Optional[Dict]) -> Optional[Filter]:
+        """Build Qdrant filter from the filters dict - matches article structure
+        
+        Conditions from the top-level keys must all hold. An optional 'any_of'
+        dict takes the same keys, and at least one of its conditions must hold.
+        """
+        must = self._filter_conditions(filters)
+        should = self._filter_conditions(filters.get("any_of")) if filters else []
+        if not must and not should:
+            return None
+        return Filter(must=must or None, should=should or None)
+
+    def _filter_conditions(self, filters: Optional[Dict]) -> List[FieldCondition]:
+        """Translate the filter keys that have a builder in FILTER_BUILDERS into field conditions"""
+        if not filters:
+            return []
+        conditions = []
+        for key, build in FILTER_BUILDERS.items():
+            values = [filters.get(k) for k in key] if isinstance(key, tuple) else [filters.get(key)]
+            if any(values):
+                condition = build(*values)
+                if condition is not None:
+                    conditions.append(condition)
+        return conditions
+
+    def _require_collection(self):
+        """Raise ValueError unless the collection exists; checked with Qdrant once, then remembered"""
+        if self._collection_verified:
+            return
+        if not self.client.collection_exists(self.collection_name):
+            logger.error(f"Collection '{self.collection_name}' does not exist")
+            raise ValueError(f"Collection '{self.collection_name}' does not exist. Please initialize the database first.")
+        self._collection_verified = True
+
+    def _encode_query(self, query: str) -> List[float]:
+        """Embed a search query and validate its dimension"""
+        qvec = self.embed(query)
+        
+        # Validate vector dimension
+        if len(qvec) != self.vector_size:
+            logger.error(f"Vector dimension mismatch: expected {self.vector_size}, got {len(qvec)}")
+            raise ValueError(f"Vector dimension mismatch: expected {self.vector_size}, got {len(qvec)}")
+        return qvec
+
+    def _format_points(self, points) -> List[Dict]:
+        """Convert scored points to payload dicts with similarity scores"""
+        formatted_results = []
+        for r in points:
+            try:
+                # Ensure payload is a dict and add similarity score
+                payload = dict(r.payload) if r.payload else {}
+                # Share one string object per categorical value across cached result lists
+                for field in INTERNED_PAYLOAD_FIELDS:
+                    value = payload.get(field)
+                    if isinstance(value, str):
+                        payload[field] = sys.intern(value)
+                payload['similarity_score'] = float(r.score)
+                formatted_results.append(payload)
+            except Exception as e:
+                logger.warning(f"Error formatting result: {e}")
+                continue
+        return formatted_results
+
+    def _set_local_index(self, vectors: np.ndarray, payloads: List[Dict]):
+        with self._local_lock:
+            self._local_vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            self._local_payloads = payloads
+            self._local_columns = {}
+
+    def _local_index(self) -> Optional[np.ndarray]:
+        """Program vectors held for in-process search, pulled from Qdrant on first use; None if too large"""
+        if self._local_vectors is None:
+            if self._local_too_large:
+                return None
+            self._require_collection()
+            count = self.client.count(self.collection_name, exact=True).count
+            if count > LOCAL_SEARCH_MAX_POINTS:
+                logger.info(f"{count} programs exceed LOCAL_SEARCH_MAX_POINTS; searching in Qdrant")
+                self._local_too_large = True
+                return None
+            records, _ = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=max(count, 1),
+                with_payload=True,
+                with_vectors=True
+            )
+            vectors = np.array([r.vector for r in records], dtype=np.float32).reshape(-1, self.vector_size)
+            self._set_local_index(vectors, [r.payload or {} for r in records])
+        return self._local_vectors
+
+    def _local_column(self, key: str) -> np.ndarray:
+        column = self._local_columns.get(key)
+        if column is None:
+            column = np.array([p.get(key) for p in self._local_payloads], dtype=object)
+            self._local_columns[key] = column
+        return column
+
+    def _local_condition(self, condition: FieldCondition) -> np.ndarray:
+        """Evaluate one FILTER_BUILDERS condition against the in-memory payloads"""
+        if isinstance(condition.match, MatchAny):
+            allowed = frozenset(condition.match.any)
+            column = self._local_column(condition.key)
+            return np.fromiter((v in allowed for v in column), dtype=bool, count=len(column))
+        if isinstance(condition.match, MatchValue):
+            return self._local_column(condition.key) == condition.match.value
+        if condition.range is not None:
+            # Missing or non-numeric values become NaN and fail every bound, as in Qdrant
+            values = numeric_array(self._local_payloads, condition.key, np.nan)
+            mask = np.ones(len(values), dtype=bool)
+            bounds = condition.range
+            for bound, compare in ((bounds.lt, np.less), (bounds.lte, np.less_equal),
+                                   (bounds.gt, np.greater), (bounds.gte, np.greater_equal)):
+                if bound is not None:
+                    mask &= compare(values, bound)
+            return mask
+        raise ValueError(f"Unsupported local filter condition on '{condition.key}'")
+
+    def _local_mask(self, query_filter: Optional[Filter]) -> Optional[np.ndarray]:
+        if query_filter is None:
+            return None
+        mask = np.ones(len(self._local_payloads), dtype=bool)
+        for condition in query_filter.must or []:
+            mask &= self._local_condition(condition)
+        if query_filter.should:
+            mask &= np.logical_or.reduce([self._local_condition(c) for c in query_filter.should])
+        return mask
+
+    def _search_local(self, qvec: List[float], filters: Optional[Dict], limit: int) -> Optional[List[Dict]]:
+        """Exact top-k by dot product over the in-memory catalog; None when it isn't held locally"""
+        with self._local_lock:
+            vectors = self._local_index()
+            if vectors is None:
+                return None
+            payloads = self._local_payloads
+            mask = self._local_mask(self._build_filter(filters))
+
+        # Vectors are L2-normalized, so this is cosine similarity (one BLAS SGEMV)
+        scores = vectors @ np.asarray(qvec, dtype=np.float32)
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+        if limit < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        results = []
+        for i in candidates:
+            payload = dict(payloads[i])
+            payload['similarity_score'] = float(scores[i])
+            results.append(payload)
+        return results
+
+    def _search_local_misses(self, batches: List[Optional[List[Dict]]], misses: List[int],
+                             qvecs: List[List[float]], filters: List[Optional[Dict]],
+                             limits: List[int]) -> List[int]:
+        """Fill result-cache misses from the in-memory catalog; returns the misses left for Qdrant"""
+        for i in misses:
+            local_results = self._search_local(qvecs[i], filters[i], limits[i])
+            if local_results is None:
+                return [i for i, batch in enumerate(batches) if batch is None]
+            batches[i] = local_results
+            self.qv_cache.put(qvecs[i], filters[i], limits[i], local_results)
+        return []
+
+    def search_local(self, query: str, filters: Optional[Dict] = None, limit: int = 20) -> List[Dict]:
+        """
+        Search the catalog in-process, without a Qdrant query.
+
+        Scores every program exactly, which for catalogs of a few thousand rows is
+        sub-millisecond. The vectors and payloads are pulled from Qdrant on first
+        use and held in memory; load_universities drops them, so the next local
+        search pulls the new catalog.
+
+        Returns:
+            Same shape as search_universities; empty if the catalog is too large
+            to hold locally or the search fails
+        """
+        try:
+            results = self._search_local(self._encode_query(query), filters, limit)
+        except Exception as e:
+            logger.error(f"Local search error: {e}")
+            return []
+        return results if results is not None else []
+
     def search_universities(
         self,
         query: str,
@@ -206,89 +732,276 @@ class UniversityVectorDB:
     ) -> List[Dict]:
         """Search for universities with optional filters - matches article structure"""
         try:
-            # Check if collection exists
-            if not self.client.collection_exists(self.collection_name):
-                logger.error(f"Collection '{self.collection_name}' does not exist")
-                raise ValueError(f"Collection '{self.collection_name}' does not exist. Please initialize the database first.")
-            
             # Generate query embedding - matches article
-            qvec = self.encoder.encode(query).tolist()
-            
-            # Validate vector dimension
-            if len(qvec) != self.vector_size:
-                logger.error(f"Vector dimension mismatch: expected {self.vector_size}, got {len(qvec)}")
-                raise ValueError(f"Vector dimension mismatch: expected {self.vector_size}, got {len(qvec)}")
+            qvec = self._encode_query(query)
             
-            # Build Qdrant filter if provided - matches article structure
-            must = []
-            if filters and filters.get("countries"):
-                countries = filters["countries"]
-                if isinstance(countries, list) and len(countries) > 0:
-                    # Normalize country names (handle variations)
-                    normalized_countries = [c.strip() for c in countries]
-                    must.append(
-                        FieldCondition(
-                            key="country",
-                            match=MatchAny(any=normalized_countries)
-                        )
-                    )
-                    logger.info(f"Applied country filter: {normalized_countries}")
+            # Serve repeated or near-identical queries without a round-trip
+            cached = self.qv_cache.get(qvec, filters, limit)
+            if cached is not None:
+                return cached
             
-            if filters and filters.get("max_tuition"):
-                max_tuition = filters["max_tuition"]
-                if max_tuition and isinstance(max_tuition, (int, float)) and max_tuition > 0:
-                    # Add 20% buffer to account for scholarships and variations
-                    max_tuition_with_buffer = int(max_tuition * 1.2)
-                    must.append(
-                        FieldCondition(
-                            key="tuition_usd",
-                            range=Range(lte=max_tuition_with_buffer)
-                        )
-                    )
-                    logger.info(f"Applied tuition filter: <= ${max_tuition_with_buffer} (original: ${max_tuition})")
+            if LOCAL_SEARCH:
+                local_results = self._search_local(qvec, filters, limit)
+                if local_results is not None:
+                    self.qv_cache.put(qvec, filters, limit, local_results)
+                    return local_results
             
-            if filters and filters.get("level"):
-                level = filters["level"]
-                if level and isinstance(level, str):
-                    # Make level matching case-insensitive by normalizing
-                    level_normalized = level.lower().strip()
-                    must.append(
-                        FieldCondition(
-                            key="level",
-                            match=MatchValue(value=level_normalized)
-                        )
-                    )
-                    logger.info(f"Applied level filter: {level_normalized}")
+            self._require_collection()
             
-            query_filter = Filter(must=must) if must else None
+            query_filter = self._build_filter(filters)
             
             # Use query_points method - matches article format
             results = self.client.query_points(
                 collection_name=self.collection_name,
                 query=qvec,
                 query_filter=query_filter,
-                limit=limit
+                limit=limit,
+                search_params=SEARCH_PARAMS
             )
             
             # Format results - iterate over results.points (matches article format)
-            formatted_results = []
-            for r in results.points:
-                try:
-                    # Ensure payload is a dict and add similarity score
-                    payload = dict(r.payload) if r.payload else {}
-                    payload['similarity_score'] = float(r.score)
-                    formatted_results.append(payload)
-                except Exception as e:
-                    logger.warning(f"Error formatting result: {e}")
-                    continue
-            
+            formatted_results = self._format_points(results.points)
+            self.qv_cache.put(qvec, filters, limit, formatted_results)
             return formatted_results
             
         except Exception as e:
+            # The collection may have been dropped; check again next time
+            self._collection_verified = False
             logger.error(f"Search error: {e}")
             # Return empty list on error rather than crashing
             return []
 
+    def search_universities_batch(
+        self,
+        queries: List[str],
+        filters: Optional[Dict] = None,
+        limits: Optional[List[int]] = None
+    ) -> List[List[Dict]]:
+        """Run several queries sharing the same filters in a single round-trip
+        
+        Args:
+            queries: Query strings to search for
+            filters: Optional filters dict applied to every query
+            limits: Per-query result limits (defaults to 20 each)
+            
+        Returns:
+            One result list per query, in the same order as queries
+        """
+        if not queries:
+            return []
+        limits = limits or [20] * len(queries)
+        try:
+            # Encode all uncached queries in one model call
+            qvecs = self.embed_many(queries)
+            if len(qvecs[0]) != self.vector_size:
+                raise ValueError(f"Vector dimension mismatch: expected {self.vector_size}, got {len(qvecs[0])}")
+            
+            # Only queries missing from the result cache go to Qdrant
+            batches = [self.qv_cache.get(qvec, filters, limit) for qvec, limit in zip(qvecs, limits)]
+            misses = [i for i, batch in enumerate(batches) if batch is None]
+            if misses and LOCAL_SEARCH:
+                misses = self._search_local_misses(batches, misses, qvecs, [filters] * len(queries), limits)
+            if not misses:
+                return batches
+            
+            self._require_collection()
+            
+            # The same Filter object is shared by every request
+            query_filter = self._build_filter(filters)
+            requests = [
+                QueryRequest(query=qvecs[i], filter=query_filter, limit=limits[i],
+                             params=SEARCH_PARAMS, with_payload=True)
+                for i in misses
+            ]
+            responses = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=requests
+            )
+            for i, response in zip(misses, responses):
+                batches[i] = self._format_points(response.points)
+                self.qv_cache.put(qvecs[i], filters, limits[i], batches[i])
+            return batches
+        except Exception as e:
+            self._collection_verified = False
+            logger.error(f"Batch search error: {e}")
+            return [[] for _ in queries]
+
+    def create_async_client(self, prefer_grpc: bool = True) -> AsyncQdrantClient:
+        """
+        Create an async Qdrant client, talking gRPC unless prefer_grpc is False.
+        
+        gRPC channels are bound to the event loop they were created on, so
+        callers should create the client inside the loop that uses it and
+        close it when done.
+        """
+        return AsyncQdrantClient(
+            host=self.host,
+            port=self.port,
+            grpc_port=self.grpc_port,
+            prefer_grpc=prefer_grpc,
+            timeout=10
+        )
+
+    async def asearch_universities_batch(
+        self,
+        searches: List[Tuple[str, Optional[Dict]]],
+        limit: int = 20,
+        client: Optional[AsyncQdrantClient] = None
+    ) -> List[List[Dict]]:
+        """Async batch search: several (query, filters) pairs in one query_batch_points call
+        
+        Args:
+            searches: (query, filters) pairs; filters may be None
+            limit: Maximum number of results per search
+            client: Existing async client to reuse; a temporary one is created if omitted
+            
+        Returns:
+            One result list per search, in the same order as searches
+        """
+        if not searches:
+            return []
+        owns_client = client is None
+        if owns_client:
+            client = self.create_async_client()
+        try:
+            # Embedding is CPU-bound, keep it off the event loop
+            qvecs = await asyncio.to_thread(self.embed_many, [query for query, _ in searches])
+            
+            # Only searches missing from the result cache go to Qdrant
+            batches = [
+                self.qv_cache.get(qvec, filters, limit)
+                for qvec, (_, filters) in zip(qvecs, searches)
+            ]
+            misses = [i for i, batch in enumerate(batches) if batch is None]
+            if misses and LOCAL_SEARCH:
+                # The first local search pulls the catalog from Qdrant, so keep it off the event loop
+                misses = await asyncio.to_thread(
+                    self._search_local_misses, batches, misses, qvecs,
+                    [filters for _, filters in searches], [limit] * len(searches)
+                )
+            if misses:
+                requests = [
+                    QueryRequest(query=qvecs[i], filter=self._build_filter(searches[i][1]), limit=limit,
+                                 params=SEARCH_PARAMS, with_payload=True)
+                    for i in misses
+                ]
+                responses = await client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=requests
+                )
+                for i, response in zip(misses, responses):
+                    batches[i] = self._format_points(response.points)
+                    self.qv_cache.put(qvecs[i], searches[i][1], limit, batches[i])
+            return batches
+        except Exception as e:
+            logger.error(f"Async batch search error: {e}")
+            return [[] for _ in searches]
+        finally:
+            if owns_client:
+                await client.close()
+
+    async def aupsert_points(
+        self,
+        points: List[PointStruct],
+        batch_size: int = UPSERT_BATCH_SIZE,
+        concurrency: int = UPSERT_CONCURRENCY,
+        client: Optional[AsyncQdrantClient] = None
+    ) -> bool:
+        """Upsert points in batches with a bounded number of requests in flight
+        
+        All batches but the last are sent without waiting for Qdrant to apply
+        them, only for it to accept them into its update queue. The last batch
+        is sent after those are acknowledged and waits for completion; updates
+        apply in order, so every point is searchable once this returns.
+        
+        Args:
+            points: Points to upsert
+            batch_size: Points per upsert request
+            concurrency: Maximum concurrent upsert requests
+            client: Existing async client to reuse; a temporary one is created if omitted
+            
+        Returns:
+            bool: True if every batch was uploaded, False otherwise
+        """
+        batches = [points[i:i + batch_size] for i in range(0, len(points), batch_size)]
+        semaphore = asyncio.Semaphore(concurrency)
+        owns_client = client is None
+        if owns_client:
+            client = self.create_async_client(prefer_grpc=False)
+        
+        async def upload(batch_num: int, batch: List[PointStruct], wait: bool):
+            async with semaphore:
+                await client.upsert(collection_name=self.collection_name, points=batch, wait=wait)
+            print(f"📤 Uploaded batch {batch_num}/{len(batches)}")
+        
+        try:
+            results = await asyncio.gather(
+                *(upload(i, batch, False) for i, batch in enumerate(batches[:-1], 1)),
+                return_exceptions=True
+            )
+            if batches:
+                results += await asyncio.gather(
+                    upload(len(batches), batches[-1], True), return_exceptions=True
+                )
+        finally:
+            if owns_client:
+                await client.close()
+        
+        failed = [(i, r) for i, r in enumerate(results, 1) if isinstance(r, Exception)]
+        for batch_num, error in failed:
+            logger.error(f"Error uploading batch {batch_num}: {error}")
+        return not failed
+
+    async def asearch_universities(
+        self,
+        query: str,
+        filters: Optional[Dict] = None,
+        limit: int = 20,
+        client: Optional[AsyncQdrantClient] = None
+    ) -> List[Dict]:
+        """Async variant of search_universities using the gRPC client
+        
+        Args:
+            query: Free-text search query
+            filters: Optional filters dict (countries, max_tuition, level)
+            limit: Maximum number of results
+            client: Existing async client to reuse; a temporary one is created if omitted
+            
+        Returns:
+            List of university payloads with similarity scores
+        """
+        owns_client = client is None
+        if owns_client:
+            client = self.create_async_client()
+        try:
+            # Embedding is CPU-bound, keep it off the event loop
+            qvec = await asyncio.to_thread(self._encode_query, query)
+            cached = self.qv_cache.get(qvec, filters, limit)
+            if cached is not None:
+                return cached
+            
+            if LOCAL_SEARCH:
+                local_results = await asyncio.to_thread(self._search_local, qvec, filters, limit)
+                if local_results is not None:
+                    self.qv_cache.put(qvec, filters, limit, local_results)
+                    return local_results
+            
+            results = await client.query_points(
+                collection_name=self.collection_name,
+                query=qvec,
+                query_filter=self._build_filter(filters),
+                limit=limit,
+                search_params=SEARCH_PARAMS
+            )
+            formatted_results = self._format_points(results.points)
+            self.qv_cache.put(qvec, filters, limit, formatted_results)
+            return formatted_results
+        except Exception as e:
+            logger.error(f"Async search error: {e}")
+            return []
+        finally:
+            if owns_client:
+                await client.close()
 
 if __name__ == "__main__":
     # Test the database
@@ -0,0 +1,95 @@
+"""
+Client-side vector query cache
+Short-circuits repeated or near-identical Qdrant searches in-process
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.utils.hashing import stable_dumps
+
+
+class QVCache:
+    """
+    LRU cache of vector search results.
+    
+    Entries are keyed on (filters, limit, query embedding). A lookup hits on an
+    exact embedding match, or on any cached embedding for the same filters and
+    limit whose cosine similarity reaches the threshold, so near-identical
+    queries skip the network round-trip and index traversal. With a ttl,
+    entries older than ttl seconds are treated as misses.
+    """
+    
+    def __init__(self, maxsize: int = 512, similarity_threshold: float = 0.98,
+                 ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        # (filter_key, limit, embedding bytes) -> (unit embedding, results, stored_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    @staticmethod
+    def _copy(results: List[Dict]) -> List[Dict]:
+        # Callers (e.g. the ranker) annotate result dicts in place
+        return [dict(r) for r in results]
+    
+    def get(self, embedding: List[float], filters: Optional[Dict], limit: int) -> Optional[List[Dict]]:
+        """Return cached results for this or a near-identical query, or None"""
+        vector = self._unit(embedding)
+        filter_key = stable_dumps(filters or {})
+        exact_key = (filter_key, limit, vector.tobytes())
+        
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(exact_key)
+            if entry is not None:
+                self._entries.move_to_end(exact_key)
+                return self._copy(entry[1])
+            
+            candidates = [(key, entry) for key, entry in self._entries.items()
+                          if key[0] == filter_key and key[1] == limit]
+            if not candidates:
+                return None
+            
+            similarities = np.stack([entry[0] for _, entry in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+            
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            return self._copy(entry[1])
+    
+    def put(self, embedding: List[float], filters: Optional[Dict], limit: int, results: List[Dict]):
+        """Store results for a query"""
+        vector = self._unit(embedding)
+        key = (stable_dumps(filters or {}), limit, vector.tobytes())
+        with self._lock:
+            self._entries[key] = (vector, self._copy(results), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def _expire(self):
+        # Hits reorder entries without refreshing stored_at, so scan them all
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry[2] < cutoff]:
+            del self._entries[key]
+    
+    def clear(self):
+        """Drop all cached results (e.g. after re-indexing)"""
+        with self._lock:
+            self._entries.clear()
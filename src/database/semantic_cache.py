@@ -0,0 +1,139 @@
+"""
+Semantic LLM response cache
+Reuses responses for near-duplicate prompts via a Qdrant collection of prompt embeddings
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, Range, FilterSelector
+)
+
+from src.utils.llm_cache import PROMPT_VERSION, LLM_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Collection holding embedded cache keys and their responses
+SEMANTIC_CACHE_COLLECTION = "llm_cache"
+
+# Minimum cosine similarity for a stored response to be reused
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Responses older than this are treated as misses, like the exact-match LLM cache
+SEMANTIC_CACHE_TTL_SECONDS = LLM_CACHE_TTL_SECONDS
+
+# Minimum seconds between deletions of expired entries
+SEMANTIC_CACHE_PURGE_INTERVAL = 60 * 60
+
+
+def _scope_payload(scope: Optional[Dict]) -> Dict[str, str]:
+    """Scope values as strings, so 50000 and '50000' match the same entries"""
+    return {key: str(value) for key, value in (scope or {}).items()}
+
+
+class SemanticLLMCache:
+    """
+    Response cache keyed on the embedding of a short cache text.
+
+    The cache text should hold only the parts of a prompt that vary between
+    calls: the sentence-transformer truncates long inputs, so embedding a full
+    prompt would mostly embed its static instructions. Values a reply must
+    match exactly (budgets, dates) belong in the scope dict instead, which is
+    matched as a filter. Entries are scoped to a namespace and to
+    PROMPT_VERSION, and expire after ttl seconds.
+    """
+
+    def __init__(self, vector_db, namespace: str,
+                 collection_name: str = SEMANTIC_CACHE_COLLECTION,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL_SECONDS):
+        self.vector_db = vector_db
+        self.namespace = namespace
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self._ready = False
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure_collection(self) -> bool:
+        """Create the cache collection on first use"""
+        with self._lock:
+            if not self._ready:
+                client = self.vector_db.client
+                if not client.collection_exists(self.collection_name):
+                    client.create_collection(
+                        collection_name=self.collection_name,
+                        vectors_config=VectorParams(size=self.vector_db.vector_size, distance=Distance.DOT)
+                    )
+                self._ready = True
+        return self._ready
+
+    def _scope(self, scope: Optional[Dict], now: float) -> Filter:
+        """Entries of this namespace and prompt version, unexpired and matching scope exactly"""
+        return Filter(must=[
+            FieldCondition(key="namespace", match=MatchValue(value=self.namespace)),
+            FieldCondition(key="prompt_version", match=MatchValue(value=PROMPT_VERSION)),
+            FieldCondition(key="created_at", range=Range(gte=now - self.ttl)),
+            *(FieldCondition(key=f"scope.{key}", match=MatchValue(value=value))
+              for key, value in _scope_payload(scope).items())
+        ])
+
+    def _purge_expired(self, now: float):
+        """Delete expired entries, at most once per SEMANTIC_CACHE_PURGE_INTERVAL"""
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + SEMANTIC_CACHE_PURGE_INTERVAL
+        self.vector_db.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="created_at", range=Range(lt=now - self.ttl))
+            ])),
+            wait=False
+        )
+
+    def get(self, cache_text: str, scope: Optional[Dict] = None) -> Optional[str]:
+        """Return the response stored for the most similar cache text in scope, if similar enough"""
+        try:
+            self._ensure_collection()
+            hits = self.vector_db.client.query_points(
+                collection_name=self.collection_name,
+                query=self.vector_db.embed(cache_text),
+                query_filter=self._scope(scope, time.time()),
+                limit=1,
+                score_threshold=self.threshold,
+                with_payload=True
+            ).points
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None
+        return hits[0].payload.get("response") if hits else None
+
+    def put(self, cache_text: str, response: str, scope: Optional[Dict] = None):
+        """Store a response under the embedding of cache_text, reusable only within the same scope"""
+        now = time.time()
+        try:
+            self._ensure_collection()
+            self._purge_expired(now)
+            self.vector_db.client.upsert(
+                collection_name=self.collection_name,
+                points=[PointStruct(
+                    id=str(uuid.uuid4()),
+                    vector=self.vector_db.embed(cache_text),
+                    payload={
+                        "namespace": self.namespace,
+                        "prompt_version": PROMPT_VERSION,
+                        "cache_text": cache_text,
+                        "scope": _scope_payload(scope),
+                        "response": response,
+                        "created_at": now
+                    }
+                )]
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {e}")
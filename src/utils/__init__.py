@@ -5,9 +5,15 @@ Handles embeddings, ranking, and other utility functions
 
 from .ranking import UniversityRanker
 from .groq_llm import GroqLLM, create_groq_llm
+from .hashing import stable_dumps, stable_hash, prompt_json
+from .profile import coerce_list
 
 __all__ = [
     'UniversityRanker',
     'GroqLLM',
-    'create_groq_llm'
+    'create_groq_llm',
+    'stable_dumps',
+    'stable_hash',
+    'prompt_json',
+    'coerce_list'
 ]
@@ -4,12 +4,31 @@ Provides a compatible interface for CrewAI agents
 """
 
 import os
+import asyncio
+from functools import lru_cache
 from typing import Optional, Dict, Any, List
-from groq import Groq
+from groq import Groq, AsyncGroq
 import logging
 
+from src.utils.llm_cache import LLMResponseCache, default_llm_cache
+from src.utils.rate_limiter import TokenBucket, default_rate_limiter, estimate_tokens
+
 logger = logging.getLogger(__name__)
 
+# Highest temperature whose replies are cached by default; above it, replies are sampled afresh
+CACHEABLE_TEMPERATURE = 0.01
+
+
+@lru_cache(maxsize=4)
+def _groq_client(api_key: str) -> Groq:
+    """
+    Groq client shared by every GroqLLM using the same key
+    
+    The SDK keeps a pooled keep-alive HTTP client per instance, so sharing it
+    lets all models and agents reuse the same open connections.
+    """
+    return Groq(api_key=api_key)
+
 
 class GroqLLM:
     """
@@ -20,7 +39,9 @@ class GroqLLM:
                  model: str = "llama-3.3-70b-versatile",
                  temperature: float = 0.7,
                  api_key: Optional[str] = None,
-                 max_tokens: int = 4096):
+                 max_tokens: int = 4096,
+                 cache: Optional[LLMResponseCache] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
         """
         Initialize Groq LLM
         
@@ -29,8 +50,12 @@ class GroqLLM:
             temperature: Sampling temperature
             api_key: Groq API key
             max_tokens: Maximum tokens to generate
+            cache: Response cache consulted before each generate call (optional)
+            rate_limiter: Limiter every API request waits on (optional)
         """
         self.model = model
+        self.cache = cache
+        self.rate_limiter = rate_limiter
         self.temperature = temperature
         self.max_tokens = max_tokens
         
@@ -39,7 +64,7 @@ class GroqLLM:
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
-        self.client = Groq(api_key=api_key)
+        self.client = _groq_client(api_key)
         
         # CrewAI compatibility attributes
         self.model_name = model
@@ -51,6 +76,7 @@ class GroqLLM:
     def generate(self, 
                  prompt: str,
                  system_prompt: Optional[str] = None,
+                 cacheable: Optional[bool] = None,
                  **kwargs) -> str:
         """
         Generate text using Groq
@@ -58,44 +84,128 @@ class GroqLLM:
         Args:
             prompt: User prompt
             system_prompt: System prompt (optional)
+            cacheable: Use the response cache; by default only when the temperature is at
+                       most CACHEABLE_TEMPERATURE, since sampled replies should vary
             **kwargs: Additional parameters
             
         Returns:
             Generated text
         """
         try:
-            # Prepare messages
-            messages = []
-            
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            messages.append({
-                "role": "user", 
-                "content": prompt
-            })
+            # Identical prompts and settings are answered from the response cache
+            cache_key = self._cache_key(prompt, system_prompt, cacheable, **kwargs)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
             # Generate response
+            self._throttle(prompt, system_prompt)
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._messages(prompt, system_prompt),
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 **kwargs
             )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if cache_key is not None and content:
+                self.cache.put(cache_key, content, self.model)
+            return content
             
         except Exception as e:
             logger.error(f"Groq generation failed: {e}")
             raise
     
+    def create_async_client(self) -> AsyncGroq:
+        """
+        Create an AsyncGroq client for the running event loop.
+        
+        Its connection pool is bound to the loop it is used on, so callers
+        create it inside that loop and close it when done.
+        """
+        return AsyncGroq(api_key=self.client.api_key, max_retries=2, timeout=60.0)
+    
+    async def agenerate(self, 
+                        prompt: str,
+                        system_prompt: Optional[str] = None,
+                        client: Optional[AsyncGroq] = None,
+                        cacheable: Optional[bool] = None,
+                        **kwargs) -> str:
+        """
+        Async variant of generate, sharing its response cache and rate limiter
+        
+        Args:
+            prompt: User prompt
+            system_prompt: System prompt (optional)
+            client: Existing async client to reuse; a temporary one is created if omitted
+            cacheable: Use the response cache; by default only when the temperature is at
+                       most CACHEABLE_TEMPERATURE, since sampled replies should vary
+            **kwargs: Additional parameters
+            
+        Returns:
+            Generated text
+        """
+        cache_key = self._cache_key(prompt, system_prompt, cacheable, **kwargs)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        owns_client = client is None
+        if owns_client:
+            client = self.create_async_client()
+        try:
+            # The limiter blocks its thread, so wait on it off the event loop
+            await asyncio.to_thread(self._throttle, prompt, system_prompt)
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(prompt, system_prompt),
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                **kwargs
+            )
+            content = response.choices[0].message.content
+            if cache_key is not None and content:
+                self.cache.put(cache_key, content, self.model)
+            return content
+        except Exception as e:
+            logger.error(f"Groq async generation failed: {e}")
+            raise
+        finally:
+            if owns_client:
+                await client.close()
+    
+    async def abatch(self, 
+                     prompts: List[str],
+                     system_prompt: Optional[str] = None,
+                     **kwargs) -> List[str]:
+        """
+        Generate replies for several prompts with their requests in flight together
+        
+        Args:
+            prompts: User prompts
+            system_prompt: System prompt shared by every prompt (optional)
+            **kwargs: Additional parameters
+            
+        Returns:
+            One reply per prompt, in the same order
+        """
+        if not prompts:
+            return []
+        client = self.create_async_client()
+        try:
+            return list(await asyncio.gather(
+                *(self.agenerate(prompt, system_prompt, client=client, **kwargs) for prompt in prompts)
+            ))
+        finally:
+            await client.close()
+    
     def stream(self, 
                prompt: str,
                system_prompt: Optional[str] = None,
+               cacheable: Optional[bool] = None,
                **kwargs):
         """
         Stream text generation using Groq
@@ -103,44 +213,84 @@ class GroqLLM:
         Args:
             prompt: User prompt
             system_prompt: System prompt (optional)
+            cacheable: Use the response cache; by default only when the temperature is at
+                       most CACHEABLE_TEMPERATURE, since sampled replies should vary
             **kwargs: Additional parameters
             
         Yields:
-            Generated text chunks
+            Generated text chunks; a cached response is yielded as a single chunk
         """
         try:
-            # Prepare messages
-            messages = []
-            
-            if system_prompt:
-                messages.append({
-                    "role": "system",
-                    "content": system_prompt
-                })
-            
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
+            # Shares the response cache with generate, so either path can serve the other's replies
+            cache_key = self._cache_key(prompt, system_prompt, cacheable, **kwargs)
+            if cache_key is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
             
             # Stream response
+            self._throttle(prompt, system_prompt)
             stream = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._messages(prompt, system_prompt),
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
                 stream=True,
                 **kwargs
             )
             
+            parts = []
             for chunk in stream:
                 if chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
                     yield chunk.choices[0].delta.content
+            
+            # Only a fully consumed stream is cached
+            if cache_key is not None and parts:
+                self.cache.put(cache_key, "".join(parts), self.model)
                     
         except Exception as e:
             logger.error(f"Groq streaming failed: {e}")
             raise
     
+    def _messages(self, prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+        """Chat messages for a prompt and optional system prompt"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _throttle(self, prompt: str, system_prompt: Optional[str]):
+        """Wait for rate-limit budget covering the prompt before an API request"""
+        if self.rate_limiter is None:
+            return
+        waited = self.rate_limiter.acquire(estimate_tokens(prompt) + estimate_tokens(system_prompt or ""))
+        if waited:
+            logger.info(f"Waited {waited:.1f}s for Groq rate limit")
+    
+    def _cache_key(self, prompt: str, system_prompt: Optional[str],
+                   cacheable: Optional[bool] = None, **kwargs) -> Optional[str]:
+        """Response cache key for a request, or None when caching is off
+        
+        An explicit cacheable is honored as given; None caches only
+        near-deterministic requests (temperature <= CACHEABLE_TEMPERATURE).
+        The key covers model, temperature, max_tokens, system prompt and prompt,
+        so a reply is only reused for an identical request.
+        """
+        if cacheable is None:
+            cacheable = self.temperature <= CACHEABLE_TEMPERATURE
+        if self.cache is None or not cacheable:
+            return None
+        return self.cache.make_key(
+            self.model, prompt,
+            system_prompt=system_prompt,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **kwargs
+        )
+    
     def get_available_models(self) -> list:
         """
         Get available Groq models
@@ -229,22 +379,38 @@ class GroqLLM:
 
 def create_groq_llm(model: str = "llama-3.1-8b-instant", 
                    temperature: float = 0.7,
-                   api_key: Optional[str] = None) -> GroqLLM:
+                   api_key: Optional[str] = None,
+                   use_cache: bool = True,
+                   rate_limit: bool = True) -> GroqLLM:
     """
     Factory function to create Groq LLM instance
     
+    Calls with the same settings share one instance, and with it one Groq
+    client and its connection pool.
+    
     Args:
         model: Groq model name
         temperature: Sampling temperature
         api_key: Groq API key
+        use_cache: Serve repeated prompts from the shared on-disk response cache
+        rate_limit: Pace API requests through the shared Groq rate limiter
         
     Returns:
         GroqLLM instance
     """
+    # Positional call so every spelling of the same settings hits one cache entry
+    return _shared_groq_llm(model, float(temperature), api_key, use_cache, rate_limit)
+
+
+@lru_cache(maxsize=8)
+def _shared_groq_llm(model: str, temperature: float, api_key: Optional[str],
+                     use_cache: bool, rate_limit: bool) -> GroqLLM:
     return GroqLLM(
         model=model,
         temperature=temperature,
-        api_key=api_key
+        api_key=api_key,
+        cache=default_llm_cache() if use_cache else None,
+        rate_limiter=default_rate_limiter() if rate_limit else None
     )
 
 
@@ -0,0 +1,65 @@
+"""
+Stable serialization and hashing helpers
+Used to build cache keys over profiles, queries and recommendation lists,
+and to serialize structured data embedded in LLM prompts
+"""
+
+import hashlib
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+
+def stable_dumps(obj: Any) -> bytes:
+    """
+    Serialize an object to canonical JSON bytes (sorted keys)
+    
+    Args:
+        obj: JSON-like object; unknown types are stringified
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(obj, sort_keys=True, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def stable_hash(obj: Any) -> str:
+    """
+    Hash an object's canonical JSON form
+    
+    Args:
+        obj: JSON-like object
+        
+    Returns:
+        Hex digest that is stable across processes
+    """
+    return hashlib.sha256(stable_dumps(obj)).hexdigest()
+
+
+def prompt_json(obj: Any) -> str:
+    """
+    Serialize an object as indented JSON for embedding in an LLM prompt
+    
+    Args:
+        obj: JSON-like object; unknown types are stringified
+        
+    Returns:
+        JSON text with 2-space indentation, keys in their original order
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf-8')
+    return json.dumps(obj, indent=2, default=str, ensure_ascii=False)
@@ -0,0 +1,125 @@
+"""
+Persistent LLM response cache
+Short-circuits repeated prompts to the same model and sampling settings
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from src.utils.hashing import stable_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump when prompt templates change so stale responses are no longer served
+PROMPT_VERSION = 'v1'
+
+# On-disk cache file, relative to the project root
+LLM_CACHE_PATH = os.path.join('data', 'processed', 'llm_cache.json')
+
+# Responses older than this are treated as misses
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Responses kept in memory in front of the file
+LLM_CACHE_MEMORY_SIZE = 256
+
+
+class LLMResponseCache:
+    """
+    Two-level cache of LLM responses keyed by a SHA-256 of the prompt.
+
+    L1 is an in-process LRU; L2 is a JSON file of
+    {key: {"response", "model", "expires_at"}} that survives restarts.
+    The file is loaded lazily on the first L1 miss and rewritten on each store.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 maxsize: int = LLM_CACHE_MEMORY_SIZE):
+        if path is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            path = os.path.join(project_root, LLM_CACHE_PATH)
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (response, expires_at)
+        self._memory = OrderedDict()
+        self._disk: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, **settings) -> str:
+        """Hash the prompt version, model, prompt and any sampling settings"""
+        return stable_hash({'version': PROMPT_VERSION, 'model': model, 'prompt': prompt, **settings})
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+            record = self._load_disk().get(key)
+            if record is None or record.get('expires_at', 0) <= now:
+                return None
+            self._remember(key, record['response'], record['expires_at'])
+            return record['response']
+
+    def put(self, key: str, response: str, model: str):
+        """Store a response in memory and on disk"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            self._load_disk()[key] = {'response': response, 'model': model, 'expires_at': expires_at}
+            self._save_disk()
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _load_disk(self) -> Dict[str, Dict[str, Any]]:
+        if self._disk is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    records = json.load(f)
+            except FileNotFoundError:
+                records = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable LLM cache {self.path}: {e}")
+                records = {}
+            now = time.time()
+            self._disk = {k: v for k, v in records.items() if v.get('expires_at', 0) > now}
+        return self._disk
+
+    def _save_disk(self):
+        # Write to a temp file and swap it in so readers never see a partial file
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._disk, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not persist LLM cache to {self.path}: {e}")
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_llm_cache() -> LLMResponseCache:
+    """Process-wide LLM response cache backed by LLM_CACHE_PATH"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
@@ -0,0 +1,26 @@
+"""
+Student profile field helpers
+Normalizes form fields that may arrive as lists or delimited strings
+"""
+
+from typing import Any, List
+
+
+def coerce_list(value: Any, sep: str = ',') -> List[str]:
+    """
+    Normalize a list or delimited string into a list of stripped, non-empty strings
+    
+    Args:
+        value: List/tuple of values, a sep-delimited string, or anything else (treated as empty)
+        sep: Delimiter used when value is a string
+        
+    Returns:
+        List of stripped string items
+    """
+    if isinstance(value, str):
+        items = value.split(sep)
+    elif isinstance(value, (list, tuple)):
+        items = map(str, value)
+    else:
+        return []
+    return [item for item in map(str.strip, items) if item]
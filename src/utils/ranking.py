@@ -1,7 +1,130 @@
-import pandas as pd
+import time
 import numpy as np
-from typing import List, Dict
-from datetime import datetime
+from bisect import bisect_left
+from functools import lru_cache
+from typing import List, Dict, Optional, Sequence, Tuple
+from datetime import date, datetime
+
+
+# Numeric payload fields transposed into arrays for vectorized ranking,
+# mapped to the default used when a value is missing or unparsable
+NUMERIC_FIELDS = {
+    'similarity_score': 0.0,
+    'acceptance_rate': 0.5,
+    'employment_rate_6mo': 0.5
+}
+
+# Annual cost as a multiple of budget: within each bound, and beyond the last
+FINANCIAL_FIT_BOUNDS = np.array([1.0, 1.15, 1.30])
+FINANCIAL_FIT_SCORES = np.array([1.0, 0.8, 0.5, 0.2])
+
+# Score factors in breakdown order, matching the weights in UniversityRanker
+SCORE_FACTORS = ('semantic', 'acceptance_fit', 'financial_fit', 'research', 'employment', 'deadline')
+
+# Below this many candidates, scoring each in Python beats NumPy's fixed per-call overhead
+# (about 13 us vs 86 us for one candidate; the two meet at a few hundred)
+SCALAR_RANK_THRESHOLD = 256
+
+# How long a ranker reuses today's date before reading the clock again
+TODAY_CACHE_SECONDS = 60
+
+# Portfolio slots per category, in the order they are returned
+PORTFOLIO_SLOTS = {'Reach': 3, 'Target': 4, 'Safety': 3}
+
+RESEARCH_SCORES = {
+    'Very High': 1.0,
+    'High': 0.8,
+    'Good': 0.6,
+    'Medium': 0.4
+}
+
+# research_output levels as small integer codes; the extra last code is for unknown
+# levels, and RESEARCH_LUT maps each code to its score
+RESEARCH_CODES = {level: code for code, level in enumerate(RESEARCH_SCORES)}
+RESEARCH_UNKNOWN = len(RESEARCH_CODES)
+RESEARCH_LUT = np.array([*RESEARCH_SCORES.values(), 0.5])
+
+
+def _to_float(value, default: float) -> float:
+    """Coerce a payload value to float, falling back to default"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value) if value and value != 'N/A' else default
+        except ValueError:
+            return default
+    return default
+
+
+def float_array(values: Sequence, default: float) -> np.ndarray:
+    """Coerce payload values to a float64 array, using default where unparsable"""
+    return np.fromiter((_to_float(v, default) for v in values), dtype=np.float64, count=len(values))
+
+
+def annual_cost(university: Dict) -> float:
+    """Tuition plus twelve months of living costs, read from the ingest-time total when present"""
+    total = university.get('total_cost_annual')
+    if isinstance(total, (int, float)) and not isinstance(total, bool):
+        return float(total)
+    return _to_float(university.get('tuition_usd'), 0.0) + _to_float(university.get('living_cost_monthly'), 0.0) * 12
+
+
+def numeric_array(universities: List[Dict], field: str, default: float) -> np.ndarray:
+    """Gather one numeric payload field into a float64 array"""
+    return float_array([u.get(field) for u in universities], default)
+
+
+def to_arrays(universities: List[Dict]) -> Dict[str, np.ndarray]:
+    """Transpose candidate dicts into a struct-of-arrays for vectorized scoring"""
+    n = len(universities)
+    arrays = {
+        field: numeric_array(universities, field, default)
+        for field, default in NUMERIC_FIELDS.items()
+    }
+    arrays['total_cost'] = np.fromiter((annual_cost(u) for u in universities), dtype=np.float64, count=n)
+    arrays['research_code'] = np.fromiter(
+        (RESEARCH_CODES.get(u.get('research_output', 'Medium'), RESEARCH_UNKNOWN) for u in universities),
+        dtype=np.int8, count=n
+    )
+    arrays['deadline'] = np.array([u.get('deadline', '') for u in universities], dtype=object)
+    return arrays
+
+
+@lru_cache(maxsize=4096)
+def _days_until(deadline, today_ordinal: int) -> float:
+    """Calendar days from the given day to a deadline, NaN if unparsable.
+
+    Deadlines come from a small set of dates shared across programs, so after
+    the first ranking each one is a cache hit; the day is part of the key.
+    """
+    try:
+        # C-level ISO-8601 parser; accepts plain dates as well as timestamps
+        parsed = datetime.fromisoformat(deadline)
+    except (TypeError, ValueError):
+        return np.nan
+    return float(parsed.toordinal() - today_ordinal)
+
+
+def top_k_order(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first; all indices when k is None.
+
+    Partitions in O(N) and sorts only the selected k. Ties are broken by
+    position, so the result equals the first k of a stable descending sort.
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # NaN ranks last, as in the full sort
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    threshold = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+    selected = np.concatenate([above, tied])
+    return selected[np.argsort(-scores[selected], kind='stable')]
 
 
 class UniversityRanker:
@@ -16,6 +139,42 @@ class UniversityRanker:
             'employment_rate': 0.10,
             'deadline_urgency': 0.05
         }
+        # Per-profile constants, keyed on the profile fields that affect scoring
+        self._profile_cache = {}
+        # (monotonic expiry, ordinal) of the day deadlines are counted from
+        self._today = (0.0, 0)
+
+    def _today_ordinal(self) -> int:
+        """Today's date ordinal, re-read from the clock at most every TODAY_CACHE_SECONDS"""
+        expires_at, ordinal = self._today
+        now = time.monotonic()
+        if now >= expires_at:
+            ordinal = date.today().toordinal()
+            self._today = (now + TODAY_CACHE_SECONDS, ordinal)
+        return ordinal
+
+    def prepare_profile(self, student_profile: Dict) -> Dict:
+        """Derive and memoize the per-profile constants used by ranking"""
+        key = tuple(str(student_profile.get(field)) for field in ('gpa', 'budget', 'work_experience'))
+        prepared = self._profile_cache.get(key)
+        if prepared is None:
+            if len(self._profile_cache) >= 256:
+                self._profile_cache.clear()
+            student_strength = self._calculate_student_strength(student_profile)
+            budget = _to_float(student_profile.get('budget', 50000), 50000.0)
+            prepared = {
+                'student_strength': student_strength,
+                'budget': budget,
+                # Loop invariants of the acceptance and financial fits
+                'ideal_acceptance': student_strength * 2,
+                'financial_bounds': self._financial_bounds(budget)
+            }
+            self._profile_cache[key] = prepared
+        return prepared
+
+    async def aprepare_profile(self, student_profile: Dict) -> Dict:
+        """Async wrapper so profile preparation can be gathered alongside a search"""
+        return self.prepare_profile(student_profile)
 
     def calculate_acceptance_fit(self, acceptance_rate: float, student_strength: float) -> float:
         """
@@ -49,122 +208,183 @@ class UniversityRanker:
             return 0.5  # Default score if conversion fails
         
         total_cost = tuition + (living_cost * 12)  # Annual living cost
+        return float(self._financial_fit(np.array([total_cost]), self._financial_bounds(budget))[0])
 
-        if total_cost <= budget:
-            return 1.0
-        elif total_cost <= budget * 1.15:
-            return 0.8
-        elif total_cost <= budget * 1.30:
-            return 0.5
-        else:
-            return 0.2
+    @staticmethod
+    def _financial_bounds(budget: float) -> np.ndarray:
+        """Annual cost bounds for the financial fit tiers; shared through the profile cache, so read-only"""
+        # Bounds must ascend for searchsorted
+        bounds = FINANCIAL_FIT_BOUNDS * max(budget, 0.0)
+        bounds.setflags(write=False)
+        return bounds
+
+    @staticmethod
+    def _financial_fit(total_cost: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+        """Branchless financial fit: bucket each annual cost against the budget bounds and gather its score"""
+        # NaN costs sort past the last bound
+        return FINANCIAL_FIT_SCORES[np.searchsorted(bounds, total_cost, side='left')]
 
     def calculate_research_score(self, research_output: str) -> float:
         """Convert research output to score"""
-        mapping = {
-            'Very High': 1.0,
-            'High': 0.8,
-            'Good': 0.6,
-            'Medium': 0.4
-        }
-        return mapping.get(research_output, 0.5)
+        return RESEARCH_SCORES.get(research_output, 0.5)
 
     def calculate_deadline_score(self, deadline_str: str) -> float:
         """Score based on deadline urgency"""
-        try:
-            deadline = pd.to_datetime(deadline_str)
-            today = pd.Timestamp.now()
-            days_remaining = (deadline - today).days
-
-            if days_remaining < 30:
-                return 0.3  # Too urgent
-            elif days_remaining < 90:
-                return 0.7  # Tight but manageable
-            elif days_remaining < 180:
-                return 1.0  # Ideal timeframe
-            else:
-                return 0.9  # Plenty of time
-        except Exception:
+        return float(self._deadline_scores(np.array([deadline_str], dtype=object))[0])
+
+    def _days_remaining(self, deadlines: np.ndarray) -> np.ndarray:
+        """Calendar days from today to each deadline; NaN where unparsable"""
+        today = self._today_ordinal()
+        return np.fromiter((_days_until(d, today) for d in deadlines), dtype=np.float64, count=len(deadlines))
+
+    def _deadline_scores(self, deadlines: np.ndarray) -> np.ndarray:
+        """Vectorized calculate_deadline_score over an array of deadline strings"""
+        days_remaining = self._days_remaining(deadlines)
+        scores = np.select(
+            [days_remaining < 30, days_remaining < 90, days_remaining < 180],
+            [0.3, 0.7, 1.0],  # Too urgent, tight but manageable, ideal timeframe
+            default=0.9  # Plenty of time
+        )
+        # Unparsable or missing deadlines get the neutral score
+        return np.where(np.isnan(days_remaining), 0.5, scores)
+
+    @staticmethod
+    def _deadline_score_from_days(days_remaining: float) -> float:
+        """Scalar form of the _deadline_scores tiers"""
+        if days_remaining != days_remaining:  # NaN: unparsable or missing
             return 0.5
+        if days_remaining < 30:
+            return 0.3
+        if days_remaining < 90:
+            return 0.7
+        if days_remaining < 180:
+            return 1.0
+        return 0.9
 
-    def rank_universities(self, universities: List[Dict], student_profile: Dict) -> List[Dict]:
-        """Main ranking function"""
-        student_strength = self._calculate_student_strength(student_profile)
-        budget = student_profile.get('budget', 50000)
+    def _rank_scalar(self, universities: List[Dict], prepared: Dict,
+                     top_k: Optional[int]) -> Tuple[List[int], List[Tuple], List[float]]:
+        """
+        Score a short candidate list one university at a time.
         
-        # Convert budget to numeric
-        if isinstance(budget, str):
-            try:
-                budget = float(budget)
-            except (ValueError, TypeError):
-                budget = 50000
-        elif not isinstance(budget, (int, float)):
-            budget = 50000
+        Applies the same arithmetic in the same order as rank_universities_vec,
+        including the weighted sum and rounding, so the scores are identical.
+        
+        Returns:
+            Tuple of (ranked indices, per-factor score tuples, final scores)
+        """
+        today = self._today_ordinal()
+        ideal_acceptance = prepared['ideal_acceptance']
+        bounds = prepared['financial_bounds'].tolist()
+        financial_scores = FINANCIAL_FIT_SCORES.tolist()
+        w_sem, w_acc, w_fin, w_res, w_emp, w_dl = self.weights.values()
 
+        breakdowns = []
+        totals = []
         for uni in universities:
-            # Safely extract and convert values
-            similarity_score = uni.get('similarity_score', 0)
-            if isinstance(similarity_score, str):
-                try:
-                    similarity_score = float(similarity_score)
-                except (ValueError, TypeError):
-                    similarity_score = 0
-            
-            acceptance_rate = uni.get('acceptance_rate', 0.5)
-            if isinstance(acceptance_rate, str):
-                try:
-                    acceptance_rate = float(acceptance_rate)
-                except (ValueError, TypeError):
-                    acceptance_rate = 0.5
-            
-            tuition = uni.get('tuition_usd', 0)
-            living_cost = uni.get('living_cost_monthly', 0)
-            research_output = uni.get('research_output', 'Medium')
-            employment_rate = uni.get('employment_rate_6mo', 0.5)
-            deadline = uni.get('deadline', '')
-            
-            # Convert employment rate if needed
-            if isinstance(employment_rate, str):
-                try:
-                    employment_rate = float(employment_rate)
-                except (ValueError, TypeError):
-                    employment_rate = 0.5
-            
-            scores = {
-                'semantic': similarity_score,
-                'acceptance_fit': self.calculate_acceptance_fit(
-                    acceptance_rate,
-                    student_strength
-                ),
-                'financial_fit': self.calculate_financial_fit(
-                    tuition,
-                    budget,
-                    living_cost
-                ),
-                'research': self.calculate_research_score(research_output),
-                'employment': employment_rate,
-                'deadline': self.calculate_deadline_score(deadline)
-            }
+            s_sem = _to_float(uni.get('similarity_score'), 0.0)
+            s_acc = max(1 - abs(_to_float(uni.get('acceptance_rate'), 0.5) - ideal_acceptance) * 2, 0.0)
+            total_cost = annual_cost(uni)
+            # NaN costs fall in the last tier, as with searchsorted
+            s_fin = financial_scores[bisect_left(bounds, total_cost) if total_cost == total_cost else len(bounds)]
+            s_res = RESEARCH_SCORES.get(uni.get('research_output', 'Medium'), 0.5)
+            s_emp = _to_float(uni.get('employment_rate_6mo'), 0.5)
+            s_dl = self._deadline_score_from_days(_days_until(uni.get('deadline', ''), today))
+            breakdowns.append((s_sem, s_acc, s_fin, s_res, s_emp, s_dl))
+            totals.append(s_sem * w_sem + s_acc * w_acc + s_fin * w_fin + s_res * w_res + s_emp * w_emp + s_dl * w_dl)
+
+        # The same rounding as the vectorized path
+        final_scores = np.round(totals, 3).tolist()
+        # sorted is stable, so ties keep their retrieval order; NaN scores go last as in argsort
+        order = sorted(range(len(universities)),
+                       key=lambda i: (final_scores[i] != final_scores[i], -final_scores[i]))[:top_k]
+        return order, breakdowns, final_scores
+
+    def rank_universities_vec(self, arrays: Dict[str, np.ndarray], student_profile: Dict,
+                              top_k: Optional[int] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray]:
+        """
+        Score candidates held as a struct-of-arrays (see to_arrays)
+        
+        Returns:
+            Tuple of (indices sorted by descending final score, limited to the
+            best top_k when given; per-factor score arrays; final scores)
+        """
+        prepared = self.prepare_profile(student_profile)
+
+        # Fused in one buffer: max(0, 1 - 2|rate - 2 * strength|) without a temporary per step
+        acceptance_fit = arrays['acceptance_rate'] - prepared['ideal_acceptance']
+        np.abs(acceptance_fit, out=acceptance_fit)
+        np.multiply(acceptance_fit, -2, out=acceptance_fit)
+        np.add(acceptance_fit, 1, out=acceptance_fit)
+        np.maximum(acceptance_fit, 0, out=acceptance_fit)
+
+        financial_fit = self._financial_fit(arrays['total_cost'], prepared['financial_bounds'])
+
+        scores = {
+            'semantic': arrays['similarity_score'],
+            'acceptance_fit': acceptance_fit,
+            'financial_fit': financial_fit,
+            'research': RESEARCH_LUT[arrays['research_code']],
+            'employment': arrays['employment_rate_6mo'],
+            'deadline': self._deadline_scores(arrays['deadline'])
+        }
+
+        # Weighted total score, accumulated factor by factor in the scalar path's order
+        factors = iter(zip(scores.values(), self.weights.values()))
+        values, weight = next(factors)
+        final_scores = values * weight
+        weighted = np.empty_like(final_scores)
+        for values, weight in factors:
+            np.multiply(values, weight, out=weighted)
+            final_scores += weighted
+        np.round(final_scores, 3, out=final_scores)
+
+        # Ties keep their retrieval order
+        order = top_k_order(final_scores, top_k)
+        return order, scores, final_scores
+
+    def rank_universities(self, universities: List[Dict], student_profile: Dict,
+                          top_k: Optional[int] = None) -> List[Dict]:
+        """
+        Main ranking function
+        
+        Scores every candidate and sorts the list in place. With top_k, only the
+        best top_k are selected and sorted, and returned as a new list; every
+        candidate gets a final_score, but only those returned get a
+        score_breakdown and category.
+        """
+        if not universities:
+            return universities
+
+        prepared = self.prepare_profile(student_profile)
+        if len(universities) < SCALAR_RANK_THRESHOLD:
+            order, breakdowns, final_scores = self._rank_scalar(universities, prepared, top_k)
+            ranked_breakdowns = [breakdowns[i] for i in order]
+            ranked_categories = [
+                self._categorize_university(breakdown[1], prepared['student_strength'])
+                for breakdown in ranked_breakdowns
+            ]
+        else:
+            order, scores, final_array = self.rank_universities_vec(to_arrays(universities), student_profile, top_k)
+            final_scores = final_array.tolist()
+            # Gather only the ranked rows, converting each column to Python floats in one call
+            ranked_breakdowns = zip(*(values[order].tolist() for values in scores.values()))
+            ranked_categories = self._categorize_universities(
+                scores['acceptance_fit'][order], prepared['student_strength']
+            ).tolist()
+            order = order.tolist()
 
-            # Weighted total score
-            total_score = (
-                scores['semantic'] * self.weights['semantic_similarity'] +
-                scores['acceptance_fit'] * self.weights['acceptance_fit'] +
-                scores['financial_fit'] * self.weights['financial_fit'] +
-                scores['research'] * self.weights['research_quality'] +
-                scores['employment'] * self.weights['employment_rate'] +
-                scores['deadline'] * self.weights['deadline_urgency']
-            )
-
-            uni['final_score'] = round(total_score, 3)
-            uni['score_breakdown'] = scores
-            uni['category'] = self._categorize_university(
-                scores['acceptance_fit'],
-                student_strength
-            )
+        for uni, final_score in zip(universities, final_scores):
+            uni['final_score'] = final_score
 
+        ranked = [universities[i] for i in order]
+        for uni, breakdown, category in zip(ranked, ranked_breakdowns, ranked_categories):
+            uni['score_breakdown'] = dict(zip(SCORE_FACTORS, breakdown))
+            uni['category'] = category
+
+        if top_k is not None:
+            return ranked
         # Sort by final score
-        universities.sort(key=lambda x: x['final_score'], reverse=True)
+        universities[:] = ranked
         return universities
 
     def _calculate_student_strength(self, profile: Dict) -> float:
@@ -200,14 +420,28 @@ class UniversityRanker:
         else:
             return "Reach"
 
+    def _categorize_universities(self, acceptance_fit: np.ndarray, student_strength: float) -> np.ndarray:
+        """Vectorized _categorize_university"""
+        return np.select(
+            [acceptance_fit > 0.7, (student_strength > 0.7) & (acceptance_fit > 0.4)],
+            ["Target", "Safety"],
+            default="Reach"
+        )
+
     def balance_portfolio(self, universities: List[Dict]) -> List[Dict]:
         """Ensure balanced portfolio: 30% reach, 40% target, 30% safety"""
-        reach = [u for u in universities if u['category'] == 'Reach']
-        target = [u for u in universities if u['category'] == 'Target']
-        safety = [u for u in universities if u['category'] == 'Safety']
-
-        portfolio = reach[:3] + target[:4] + safety[:3]
-        return portfolio
+        # One pass over the ranked list, stopping once every slot is filled
+        picks = {category: [] for category in PORTFOLIO_SLOTS}
+        remaining = sum(PORTFOLIO_SLOTS.values())
+        for uni in universities:
+            category = uni['category']
+            bucket = picks.get(category)
+            if bucket is not None and len(bucket) < PORTFOLIO_SLOTS[category]:
+                bucket.append(uni)
+                remaining -= 1
+                if not remaining:
+                    break
+        return [uni for bucket in picks.values() for uni in bucket]
 
 
 # Test the ranker
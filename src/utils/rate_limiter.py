@@ -0,0 +1,86 @@
+"""
+Client-side rate limiting for Groq calls
+Keeps concurrent agents under the per-minute request and token limits instead of tripping 429s
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+# Groq free-tier limits for llama-3.1-8b-instant; override per account with the environment
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 6000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for rate limiting (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Thread-safe limiter over two budgets: requests and tokens per minute.
+
+    Both budgets refill continuously and start full, so short bursts go through
+    at once; acquire() blocks the calling thread until both can cover the call.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_capacity / 60)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_capacity / 60)
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Block until one request and the given tokens are available, then take them
+
+        Args:
+            tokens: Estimated tokens for the call; capped at the bucket size so
+                    an oversized prompt waits for a full bucket instead of forever
+
+        Returns:
+            Seconds spent waiting
+        """
+        tokens = min(float(tokens), self.token_capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return waited
+                # Time until both budgets can cover the call
+                delay = max(
+                    (1 - self._requests) * 60 / self.request_capacity,
+                    (tokens - self._tokens) * 60 / self.token_capacity,
+                    0.01
+                )
+            time.sleep(delay)
+            waited += delay
+
+
+_default_limiter: Optional[TokenBucket] = None
+_default_limiter_lock = threading.Lock()
+
+
+def default_rate_limiter() -> TokenBucket:
+    """Process-wide limiter sized from GROQ_RPM / GROQ_TPM, or the free-tier defaults"""
+    global _default_limiter
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = TokenBucket(
+                float(os.getenv('GROQ_RPM', DEFAULT_REQUESTS_PER_MINUTE)),
+                float(os.getenv('GROQ_TPM', DEFAULT_TOKENS_PER_MINUTE))
+            )
+        return _default_limiter
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import src.agents.verifier as verifier
+from src.utils.groq_llm import GroqLLM
+from src.utils.llm_cache import LLMResponseCache
+
+
+class FakeCompletions:
+    """Stands in for groq's chat.completions, counting requests"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content='{"mit-cs": {"confidence_score": 90}}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+RECOMMENDATIONS = [{
+    'univ_id': 'mit-cs',
+    'univ_name': 'MIT',
+    'program': 'Computer Science',
+    'deadline': '2027-01-15',
+    'tuition_usd': 55000,
+    'living_cost_monthly': 2000,
+    'acceptance_rate': 0.04,
+    'scholarship_tags': 'merit_based',
+    'country': 'USA',
+    'level': 'masters'
+}]
+
+PROFILE = {'origin_country': 'India', 'budget': 60000, 'level': 'masters', 'gpa': 3.8}
+
+
+def test_repeated_verify_with_llm_is_served_from_response_cache(tmp_path, monkeypatch):
+    # The CrewAI Agent isn't exercised by the direct LLM path
+    monkeypatch.setattr(verifier, 'cached_agent', lambda *args, **kwargs: None)
+    llm = GroqLLM(
+        model='llama-3.1-8b-instant',
+        temperature=0.7,
+        api_key='test-key',
+        cache=LLMResponseCache(path=str(tmp_path / 'llm_cache.json'))
+    )
+    completions = FakeCompletions()
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    agent = verifier.VerifierAgent(llm)
+
+    first = agent.verify_with_llm(RECOMMENDATIONS, PROFILE)
+    second = agent.verify_with_llm(RECOMMENDATIONS, PROFILE)
+
+    assert second == first
+    assert completions.calls == 1